@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class MapperConfig(AppConfig):
     name = 'apps.mapper'
+
+    def ready(self):
+        from apps.mapper.serializers.serializers import CONTENT_TYPE_MODELS
+
+        CONTENT_TYPE_MODELS.update(
+            (model._meta.model_name, model) for model in self.get_models()
+        )
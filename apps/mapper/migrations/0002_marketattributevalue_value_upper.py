@@ -0,0 +1,29 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mapper', '0001_initial'),
+    ]
+
+    # NOTE: value is TEXT, so its upper case prefix is indexed through
+    # virtual column, 191 chars fit utf8mb4 index key length limit
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                ALTER TABLE mapper_marketattributevalue
+                ADD COLUMN value_upper VARCHAR(191)
+                    AS (UPPER(LEFT(value, 191))) VIRTUAL,
+                ADD INDEX mapper_marketattributevalue_dictionary_value_upper (
+                    dictionary_id,
+                    value_upper
+                )
+            """,
+            reverse_sql="""
+                ALTER TABLE mapper_marketattributevalue
+                DROP INDEX mapper_marketattributevalue_dictionary_value_upper,
+                DROP COLUMN value_upper
+            """,
+        ),
+    ]
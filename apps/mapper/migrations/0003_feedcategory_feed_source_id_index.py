@@ -0,0 +1,17 @@
+# Generated by Django 3.2 on 2026-10-15 23:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mapper', '0002_marketattributevalue_value_upper'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='feedcategory',
+            index=models.Index(fields=['feed', 'source_id'], name='mapper_feed_feed_id_179068_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2 on 2026-10-15 23:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mapper', '0003_feedcategory_feed_source_id_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='marketattributevalue',
+            index=models.Index(fields=['dictionary', 'deleted'], name='mapper_mark_diction_d37830_idx'),
+        ),
+    ]
@@ -157,6 +157,9 @@ class FeedCategory(models.Model):
         """Verbose name."""
 
         verbose_name_plural = "Feed categories"
+        indexes = [
+            models.Index(fields=['feed', 'source_id']),
+        ]
 
     def __str__(self) -> str:
         """Return string representation of FeedCategory model."""
@@ -165,9 +168,7 @@ class FeedCategory(models.Model):
     @property
     def is_mapped(self) -> bool:
         """Check if category is mapped."""
-        if CategoryMap.objects.filter(
-            feed_category=self.id,
-        ).exists():
+        if self.categorymap_set.exists():
             return True
 
         return False
@@ -176,9 +177,7 @@ class FeedCategory(models.Model):
     def mapping_data(self) -> MappingDataStorage:
         """Return mapping related data."""
         try:
-            mappings = CategoryMap.objects.filter(
-                feed_category=self.id,
-            )
+            mappings = self.categorymap_set.all()
 
             mapping_data = [
                 mapping.get_mapping_data()
@@ -193,23 +192,39 @@ class FeedCategory(models.Model):
 
     @property
     def children(self) -> List[Dict[str, Any]]:
-        """Show category children."""
-        children = FeedCategory.objects.filter(parent=self.id)
-
-        data = [
-            {
-                'id': category.id,
-                'feed_id': category.feed.id,
-                'parent_id': category.parent.id,
-                'name': category.name,
-                'deleted': category.deleted,
-                'is_mapped': category.is_mapped,
-                'mapping_data': category.mapping_data,
-                'children': category.children,
-            } for category in children
-        ]
-
-        return data
+        """Show category children.
+
+        Sub-tree is walked level by level without recursion, one query
+        per tree level instead of several per category.
+        """
+        data_by_id: Dict[int, Dict[str, Any]] = {self.id: {'children': []}}
+        parent_ids = [self.id]
+        while parent_ids:
+            categories = FeedCategory.objects.filter(
+                parent_id__in=parent_ids,
+            ).prefetch_related(models.Prefetch(
+                'categorymap_set',
+                queryset=CategoryMap.objects.select_related(
+                    *CategoryMap.MAPPING_DATA_RELATED,
+                ),
+            ))
+
+            parent_ids = []
+            for category in categories:
+                data = data_by_id[category.id] = {
+                    'id': category.id,
+                    'feed_id': category.feed_id,
+                    'parent_id': category.parent_id,
+                    'name': category.name,
+                    'deleted': category.deleted,
+                    'is_mapped': category.is_mapped,
+                    'mapping_data': category.mapping_data,
+                    'children': [],
+                }
+                data_by_id[category.parent_id]['children'].append(data)
+                parent_ids.append(category.id)
+
+        return data_by_id[self.id]['children']
 
     def get_parents(self):
         """Get parent categories."""
@@ -261,9 +276,7 @@ class FeedCategoryAttribute(models.Model):
     @property
     def is_mapped(self) -> bool:
         """Check if attribute is mapped."""
-        if AttributeMap.objects.filter(
-            feed_attribute=self.id,
-        ).exists():
+        if self.attributemap_set.exists():
             return True
 
         return False
@@ -272,9 +285,7 @@ class FeedCategoryAttribute(models.Model):
     def mapping_data(self) -> MappingDataStorage:
         """Return mapping related data."""
         try:
-            mappings = AttributeMap.objects.filter(
-                feed_attribute=self.id,
-            )
+            mappings = self.attributemap_set.all()
 
             mapping_data = [
                 mapping.get_mapping_data()
@@ -319,9 +330,7 @@ class FeedCategoryAttributeValue(models.Model):
     @property
     def is_mapped(self) -> bool:
         """Check if value is mapped."""
-        if ValueMap.objects.filter(
-            feed_attribute_value=self.id,
-        ).exists():
+        if self.valuemap_set.exists():
             return True
 
         return False
@@ -330,9 +339,7 @@ class FeedCategoryAttributeValue(models.Model):
     def mapping_data(self) -> MappingDataStorage:
         """Return mapping related data."""
         try:
-            mappings = ValueMap.objects.filter(
-                feed_attribute_value=self.id,
-            )
+            mappings = self.valuemap_set.all()
 
             mapping_data = [
                 mapping.get_mapping_data()
@@ -479,9 +486,7 @@ class MarketCategoryAttribute(models.Model):
     @property
     def is_mapped(self) -> bool:
         """Check if category is mapped."""
-        if AttributeMap.objects.filter(
-            marketplace_attribute=self.id,
-        ).exists():
+        if self.attributemap_set.exists():
             return True
 
         return False
@@ -490,9 +495,7 @@ class MarketCategoryAttribute(models.Model):
     def mapping_data(self) -> MappingDataStorage:
         """Return mapping related data."""
         try:
-            mappings = AttributeMap.objects.filter(
-                marketplace_attribute=self.id,
-            )
+            mappings = self.attributemap_set.all()
 
             mapping_data = [
                 mapping.get_mapping_data()
@@ -631,6 +634,7 @@ class MarketAttributeValue(models.Model):
         verbose_name_plural = "Marketplace category attribute values"
         indexes = [
             models.Index(fields=['source_id']),
+            models.Index(fields=['dictionary', 'deleted']),
         ]
 
     def __str__(self) -> str:
@@ -641,9 +645,7 @@ class MarketAttributeValue(models.Model):
     @property
     def is_mapped(self) -> bool:
         """Check if category attribute value is mapped."""
-        if ValueMap.objects.filter(
-            marketplace_attribute_value=self.id,
-        ).exists():
+        if self.valuemap_set.exists():
             return True
 
         return False
@@ -652,9 +654,7 @@ class MarketAttributeValue(models.Model):
     def mapping_data(self) -> MappingDataStorage:
         """Return mapping related data."""
         try:
-            mappings = ValueMap.objects.filter(
-                marketplace_attribute_value=self.id,
-            )
+            mappings = self.valuemap_set.all()
 
             mapping_data = [
                 mapping.get_mapping_data()
@@ -675,6 +675,12 @@ class CategoryMap(models.Model):
     :param int marketplace_category: Foreign key to MarketCategory
     """
 
+    # NOTE: relations read by `get_mapping_data`
+    MAPPING_DATA_RELATED = (
+        'feed_category',
+        'marketplace_category',
+    )
+
     feed_category = models.ForeignKey(
         'FeedCategory',
         on_delete=models.CASCADE,
@@ -699,11 +705,11 @@ class CategoryMap(models.Model):
         """Get dict with mapping data."""
         mapping_data = {
             'mapping_id': self.id,
-            'feed_id': self.feed_category.feed.id,
-            'feed_category_id': self.feed_category.id,
+            'feed_id': self.feed_category.feed_id,
+            'feed_category_id': self.feed_category_id,
             'feed_category': self.feed_category.name,
-            'marketplace_id': self.marketplace_category.marketplace.id,
-            'marketplace_category_id': self.marketplace_category.id,
+            'marketplace_id': self.marketplace_category.marketplace_id,
+            'marketplace_category_id': self.marketplace_category_id,
             'marketplace_category': self.marketplace_category.name,
             'marketplace_category_deleted': self.marketplace_category.deleted,
         }
@@ -719,6 +725,14 @@ class AttributeMap(models.Model):
     :param int marketplace_attribute: Foreign key to MarketCategoryAttribute
     """
 
+    # NOTE: relations read by `get_mapping_data`
+    MAPPING_DATA_RELATED = (
+        'feed_attribute__category',
+        'feed_attribute__unit',
+        'marketplace_attribute__category',
+        'marketplace_attribute__attribute',
+    )
+
     def save(self, *args, **kwargs):
         """Save method for AttributeMap model."""
         if (
@@ -761,9 +775,9 @@ class AttributeMap(models.Model):
         """Get dict with mapping data."""
         mapping_data = {
             'mapping_id': self.id,
-            'feed_id': self.feed_attribute.category.feed.id,
-            'feed_category_id': self.feed_attribute.category.id,
-            'feed_attribute_id': self.feed_attribute.id,
+            'feed_id': self.feed_attribute.category.feed_id,
+            'feed_category_id': self.feed_attribute.category_id,
+            'feed_attribute_id': self.feed_attribute_id,
             'feed_attribute': self.feed_attribute.name,
             'feed_attribute_unit': getattr(
                 self.feed_attribute.unit,
@@ -771,8 +785,8 @@ class AttributeMap(models.Model):
                 None,
             ),
             'marketplace_id':
-            self.marketplace_attribute.category.marketplace.id,
-            'marketplace_attribute_id': self.marketplace_attribute.id,
+            self.marketplace_attribute.category.marketplace_id,
+            'marketplace_attribute_id': self.marketplace_attribute_id,
             'marketplace_attribute': self.marketplace_attribute.attribute.name,
         }
 
@@ -789,6 +803,14 @@ class ValueMap(models.Model):
     :param int feed_attr_value: Feed attribute value id
     """
 
+    # NOTE: relations read by `get_mapping_data`
+    MAPPING_DATA_RELATED = (
+        'attribute_map__category_map__feed_category',
+        'attribute_map__category_map__marketplace_category',
+        'feed_attribute_value',
+        'marketplace_attribute_value',
+    )
+
     attribute_map = models.ForeignKey(
         'AttributeMap',
         on_delete=models.CASCADE,
@@ -836,10 +858,10 @@ class ValueMap(models.Model):
         category_map = self.attribute_map.category_map
         mapping_data = {
             'mapping_id': self.id,
-            'feed_id': category_map.feed_category.feed.id,
+            'feed_id': category_map.feed_category.feed_id,
             'feed_attribute_value_id': self.feed_attribute_value.id,
             'feed_attribute_value': self.feed_attribute_value.value,
-            'marketplace_id': category_map.marketplace_category.marketplace.id,
+            'marketplace_id': category_map.marketplace_category.marketplace_id,
             'marketplace_attribute_value_id':
             self.marketplace_attribute_value.id,
             'marketplace_attribute_value':
@@ -5,7 +5,7 @@ import os
 import sys
 from multiprocessing import Pool
 from pprint import pprint
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import django
 from setproctitle import setproctitle
@@ -31,13 +31,13 @@ MapperData = Tuple[Dict[str, str], str]
 FeedsData = List[Tuple[Dict[str, str], str]]
 
 
-def first_mapper_feed_parser(data: MapperData):
-    """Worker for first parser.
+_WORKER: Optional[FeedParserWorker] = None
 
-    :param tuple data:
-    """
-    search, preset_name = data
-    worker = FeedParserWorker(
+
+def init_first_mapper_feed_parser():
+    """Create parser worker once per pool process."""
+    global _WORKER
+    _WORKER = FeedParserWorker(
         mysql_table_name=MYSQL_TABLE_NAME,
         mongo_db_name=MONGO_DATABASE_NAME,
         first=True,
@@ -45,7 +45,17 @@ def first_mapper_feed_parser(data: MapperData):
         mandatory_tags=['@id', 'categoryId', 'price'],
     )
 
-    return worker.process_parser(
+
+def first_mapper_feed_parser(data: MapperData):
+    """Worker for first parser.
+
+    :param tuple data:
+    """
+    search, preset_name = data
+    if _WORKER is None:
+        init_first_mapper_feed_parser()
+
+    return _WORKER.process_parser(
         search,
         preset_collection_name=preset_name,
     )
@@ -81,7 +91,10 @@ def first_mapper_feed_parser_main() -> bool:
     session.close()
     engine.dispose()
 
-    with Pool(processes=5) as pool:
+    with Pool(
+        processes=5,
+        initializer=init_first_mapper_feed_parser,
+    ) as pool:
         results = pool.map(first_mapper_feed_parser, feed_data)
         statistics = get_statistics(results)
 
@@ -5,8 +5,10 @@ from codecs import BOM_UTF8
 from csv import DictWriter
 from datetime import datetime
 from collections import OrderedDict
+from functools import lru_cache
 
 from django.forms import model_to_dict
+from django.utils.functional import cached_property
 
 from apps.mapper.models import (
     FeedMeta,
@@ -36,13 +38,24 @@ ERRORS_DESCRIPTION = {
 }
 
 
+@lru_cache(maxsize=8)
+def get_marketplace(marketplace_id: int) -> Marketplace:
+    """Get marketplace, cached for the process lifetime."""
+    return Marketplace.objects.get(id=marketplace_id)
+
+
 class FeedMapperReport:
     """Mapper feed report class."""
 
     def __init__(self, marketplace_id, feed_id):
         """Set initial preparation."""
-        self.marketplace = Marketplace.objects.get(id=marketplace_id)
-        self.feed = FeedMeta.objects.get(id=feed_id)
+        self.marketplace = get_marketplace(marketplace_id)
+        self.feed_id = feed_id
+
+    @cached_property
+    def feed(self) -> FeedMeta:
+        """Report feed, fetched on first use."""
+        return FeedMeta.objects.get(id=self.feed_id)
 
     def build_report(self) -> str:
         """Build mapping report."""
@@ -98,13 +111,16 @@ class FeedMapperReport:
             )
         )
 
-        attribute_names = set()
-        tag_names = set()
-
-        for category_data in report_data:
-            for offer_data in category_data['offers']:
-                attribute_names.update(offer_data['attributes_errors'])
-                tag_names.update(offer_data['tags_errors'])
+        attribute_names = set().union(*(
+            offer_data['attributes_errors']
+            for category_data in report_data
+            for offer_data in category_data['offers']
+        ))
+        tag_names = set().union(*(
+            offer_data['tags_errors']
+            for category_data in report_data
+            for offer_data in category_data['offers']
+        ))
 
         const_fieldnames = OrderedDict([
             ('feed_cat_id', 'ID категории фида'),
@@ -129,46 +145,63 @@ class FeedMapperReport:
             )
             writer.writeheader()
 
-            for category_data in report_data:
-                feed_category_id = category_data['feed_category_id']
-                feed_category_name = feed_category_data[
-                    feed_category_id
-                ]['name']
-                market_category_id = (
-                    category_data['market_category_id']
-                    if self.marketplace.marketplace in ['ozon']
-                    else category_data['market_category_name']
-                )
-
-                market_category_name = market_category_data[
-                    market_category_id
-                ]['name']
-                for offer_data in category_data['offers']:
-                    const_field_values = [
-                        feed_category_id,
-                        feed_category_name,
-                        market_category_id,
-                        market_category_name,
-                        offer_data['id'],
-                        offer_data['name'],
-                        'нет' if (
-                            offer_data['tags_errors']
-                            or offer_data['attributes_errors']
-                        ) else 'да',
-                    ]
-
-                    row_values = {
-                        const_fieldnames[key]: value
-                        for key, value in zip(
-                            const_fieldnames,
-                            const_field_values,
-                        )
-                    }
-                    for errors_key in ('tags_errors', 'attributes_errors'):
-                        row_values.update({
-                            key: ERRORS_DESCRIPTION.get(value, value)
-                            for key, value in offer_data[errors_key].items()
-                        })
-
-                    writer.writerow(row_values)
+            writer.writerows(
+                self._iter_report_rows(
+                    report_data,
+                    const_fieldnames,
+                    feed_category_data,
+                    market_category_data,
+                ),
+            )
         return f'/media/mapper/reports/{filename}'
+
+    def _iter_report_rows(
+        self,
+        report_data,
+        const_fieldnames,
+        feed_category_data,
+        market_category_data,
+    ):
+        """Yield report rows one by one for `DictWriter.writerows`."""
+        for category_data in report_data:
+            feed_category_id = category_data['feed_category_id']
+            feed_category_name = feed_category_data[
+                feed_category_id
+            ]['name']
+            market_category_id = (
+                category_data['market_category_id']
+                if self.marketplace.marketplace in ['ozon']
+                else category_data['market_category_name']
+            )
+
+            market_category_name = market_category_data[
+                market_category_id
+            ]['name']
+            for offer_data in category_data['offers']:
+                const_field_values = [
+                    feed_category_id,
+                    feed_category_name,
+                    market_category_id,
+                    market_category_name,
+                    offer_data['id'],
+                    offer_data['name'],
+                    'нет' if (
+                        offer_data['tags_errors']
+                        or offer_data['attributes_errors']
+                    ) else 'да',
+                ]
+
+                row_values = {
+                    const_fieldnames[key]: value
+                    for key, value in zip(
+                        const_fieldnames,
+                        const_field_values,
+                    )
+                }
+                for errors_key in ('tags_errors', 'attributes_errors'):
+                    row_values.update({
+                        key: ERRORS_DESCRIPTION.get(value, value)
+                        for key, value in offer_data[errors_key].items()
+                    })
+
+                yield row_values
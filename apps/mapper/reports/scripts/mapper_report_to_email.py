@@ -41,11 +41,21 @@ def run_mapper_report_maker_detached(
     :param int feed_id: mapper feed id
     :param List[str] emails: emails list to send report to
     """
-    command = (
-        f'cd {SCRIPT_PATH} && {settings.PYTHON_PATH} {SCRIPT_NAME} '
-        f'--feed-id {feed_id} --emails {" ".join(emails)}',
+    command = [
+        settings.PYTHON_PATH,
+        SCRIPT_NAME,
+        '--feed-id', str(feed_id),
+        '--emails', *emails,
+    ]
+    subprocess.Popen(
+        command,
+        cwd=SCRIPT_PATH,
+        shell=False,
+        close_fds=True,
+        start_new_session=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
     )
-    subprocess.Popen(command, shell=True)
 
 
 def make_report(
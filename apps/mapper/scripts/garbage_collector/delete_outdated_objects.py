@@ -7,9 +7,11 @@ from datetime import (
     datetime,
     timedelta,
 )
+from django.db import connection, transaction
 from django.db.models import Count
+from pymongo.collection import Collection
 from setproctitle import setproctitle
-from typing import Optional
+from typing import List, Optional
 
 sys.path.append('/home/server/b2basket/')
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'b2basket.settings')
@@ -19,13 +21,12 @@ from apps.utils import run_checker  # noqa e402
 from apps.mapper.models import (
     MarketCategory,
     MarketAttribute,
-    MarketAttributeValue,
     MarketCategoryAttribute,
     MarketAttributeValueDictionary,
 )
-from apps.utils import MongoConnMixin
 from apps.utils.iterable_utils import split_to_chunks
 from apps.mapper.scripts.garbage_collector.prepare_objects_for_delete import (
+    get_mongo_db,
     MONGO_MAPPER_DB,
     MP_CATEGORY_COLLECTION,
     MP_VALUES_COLLECTION,
@@ -35,32 +36,108 @@ from apps.mapper.scripts.garbage_collector.prepare_objects_for_delete import (
 )
 
 DELETION_CHUNK_SIZE = 25000
+MONGO_DELETION_CHUNK_SIZE = 1000
+GC_IDS_INSERT_CHUNK_SIZE = 5000
+GC_IDS_TABLE = '_gc_ids'
 SECONDS_OFFSET = 60 * 60 * 24 * 14  # 14 days
 
 
-def delete_mp_attribute_values(deletion_threshold: datetime):
-    conn = MongoConnMixin(MONGO_MAPPER_DB, MP_VALUES_COLLECTION)    # noqa
-    deletion_ids = [
-        obj['id'] for obj in conn.collection.find(
+def get_scheduled_ids(
+    collection: Collection,
+    deletion_threshold: datetime,
+) -> List[int]:
+    """Get ids of objects which deletion threshold is exceeded."""
+    return [
+        obj['id'] for obj in collection.find(
             {"timestamp": {"$lt": deletion_threshold}},
-        )
+            {'id': 1, '_id': 0},
+        ).batch_size(MONGO_DELETION_CHUNK_SIZE)
     ]
 
-    for ids_chunk in split_to_chunks(deletion_ids, DELETION_CHUNK_SIZE):
-        MarketAttributeValue.objects.filter(
-            pk__in=ids_chunk,
-            deleted=True,
-        ).delete()
-        conn.collection.delete_many({'id': {'$in': ids_chunk}})
 
+def delete_scheduled_ids(collection: Collection, deletion_ids: List[int]):
+    """Remove processed ids from Mongo collection.
 
-def delete_mp_dictionaries(deletion_threshold: datetime):
-    conn = MongoConnMixin(MONGO_MAPPER_DB, MP_DICTIONARIES_COLLECTION)
-    deletion_ids = [
-        obj['id'] for obj in conn.collection.find(
-            {"timestamp": {"$lt": deletion_threshold}},
+    One `delete_many` per small chunk keeps every operation short, so
+    deletion of a big backlog does not hold the primary for minutes.
+    """
+    for ids_chunk in split_to_chunks(deletion_ids, MONGO_DELETION_CHUNK_SIZE):
+        collection.delete_many({'id': {'$in': ids_chunk}})
+
+
+def insert_gc_ids(cursor, ids: List[int]):
+    """Insert ids into garbage collector temporary table."""
+    for ids_chunk in split_to_chunks(ids, GC_IDS_INSERT_CHUNK_SIZE):
+        placeholders = ', '.join(['(%s)'] * len(ids_chunk))
+        cursor.execute(
+            f'INSERT IGNORE INTO {GC_IDS_TABLE} (id) VALUES {placeholders}',
+            ids_chunk,
         )
-    ]
+
+
+def delete_mp_attribute_values(
+    deletion_threshold: datetime,
+    collection_name: str = MP_VALUES_COLLECTION,
+):
+    """Delete scheduled values with joined DELETEs per chunk.
+
+    Values are the biggest garbage collector table, so instead of
+    `DELETE ... WHERE id IN (...)`, each chunk of scheduled ids is loaded
+    into temporary table and deleted by join with it. Value mappings are
+    deleted beforehand, the same way ORM cascade does.
+
+    Every chunk is committed and removed from Mongo on its own, so a big
+    backlog neither holds long locks nor restarts from scratch on failure.
+    """
+    collection = get_mongo_db(MONGO_MAPPER_DB)[collection_name]
+    deletion_ids = get_scheduled_ids(collection, deletion_threshold)
+
+    if not deletion_ids:
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            CREATE TEMPORARY TABLE IF NOT EXISTS {GC_IDS_TABLE} (
+                id BIGINT PRIMARY KEY
+            )
+        """)
+
+        try:
+            for ids_chunk in split_to_chunks(
+                deletion_ids,
+                DELETION_CHUNK_SIZE,
+            ):
+                with transaction.atomic():
+                    cursor.execute(f'DELETE FROM {GC_IDS_TABLE}')
+                    insert_gc_ids(cursor, ids_chunk)
+
+                    cursor.execute(f"""
+                        DELETE value_map
+                        FROM mapper_valuemap value_map
+                        JOIN mapper_marketattributevalue value
+                            ON value_map.marketplace_attribute_value_id
+                                = value.id
+                        JOIN {GC_IDS_TABLE} gc_ids ON value.id = gc_ids.id
+                        WHERE value.deleted = TRUE
+                    """)
+                    cursor.execute(f"""
+                        DELETE value
+                        FROM mapper_marketattributevalue value
+                        JOIN {GC_IDS_TABLE} gc_ids ON value.id = gc_ids.id
+                        WHERE value.deleted = TRUE
+                    """)
+
+                delete_scheduled_ids(collection, ids_chunk)
+        finally:
+            cursor.execute(f'DROP TEMPORARY TABLE IF EXISTS {GC_IDS_TABLE}')
+
+
+def delete_mp_dictionaries(
+    deletion_threshold: datetime,
+    collection_name: str = MP_DICTIONARIES_COLLECTION,
+):
+    collection = get_mongo_db(MONGO_MAPPER_DB)[collection_name]
+    deletion_ids = get_scheduled_ids(collection, deletion_threshold)
     for ids_chunk in split_to_chunks(deletion_ids, DELETION_CHUNK_SIZE):
         MarketAttributeValueDictionary.objects.annotate(
             values_count=Count('marketattributevalue'),
@@ -70,16 +147,15 @@ def delete_mp_dictionaries(deletion_threshold: datetime):
             values_count=0,
         ).delete()
 
-        conn.collection.delete_many({'id': {'$in': ids_chunk}})
+        delete_scheduled_ids(collection, ids_chunk)
 
 
-def delete_mp_attributes(deletion_threshold: datetime):
-    conn = MongoConnMixin(MONGO_MAPPER_DB, MP_ATTRIBUTES_COLLECTION)    # noqa
-    deletion_ids = [
-        obj['id'] for obj in conn.collection.find(
-            {"timestamp": {"$lt": deletion_threshold}},
-        )
-    ]
+def delete_mp_attributes(
+    deletion_threshold: datetime,
+    collection_name: str = MP_ATTRIBUTES_COLLECTION,
+):
+    collection = get_mongo_db(MONGO_MAPPER_DB)[collection_name]
+    deletion_ids = get_scheduled_ids(collection, deletion_threshold)
 
     for ids_chunk in split_to_chunks(deletion_ids, DELETION_CHUNK_SIZE):
         MarketAttribute.objects.filter(
@@ -87,16 +163,15 @@ def delete_mp_attributes(deletion_threshold: datetime):
             deleted=True,
         ).delete()
 
-        conn.collection.delete_many({'id': {'$in': ids_chunk}})
+        delete_scheduled_ids(collection, ids_chunk)
 
 
-def delete_mp_category_attributes(deletion_threshold: datetime):
-    conn = MongoConnMixin(MONGO_MAPPER_DB, MP_CATEGORY_ATTRIBUTE_COLLECTION)  # noqa
-    deletion_ids = [
-        obj['id'] for obj in conn.collection.find(
-            {"timestamp": {"$lt": deletion_threshold}},
-        )
-    ]
+def delete_mp_category_attributes(
+    deletion_threshold: datetime,
+    collection_name: str = MP_CATEGORY_ATTRIBUTE_COLLECTION,
+):
+    collection = get_mongo_db(MONGO_MAPPER_DB)[collection_name]
+    deletion_ids = get_scheduled_ids(collection, deletion_threshold)
 
     for ids_chunk in split_to_chunks(deletion_ids, DELETION_CHUNK_SIZE):
         MarketCategoryAttribute.objects.filter(
@@ -104,16 +179,15 @@ def delete_mp_category_attributes(deletion_threshold: datetime):
             deleted=True,
         ).delete()
 
-        conn.collection.delete_many({'id': {'$in': ids_chunk}})
+        delete_scheduled_ids(collection, ids_chunk)
 
 
-def delete_mp_category(deletion_threshold: datetime):
-    conn = MongoConnMixin(MONGO_MAPPER_DB, MP_CATEGORY_COLLECTION)  # noqa
-    deletion_ids = [
-        obj['id'] for obj in conn.collection.find(
-            {"timestamp": {"$lt": deletion_threshold}},
-        )
-    ]
+def delete_mp_category(
+    deletion_threshold: datetime,
+    collection_name: str = MP_CATEGORY_COLLECTION,
+):
+    collection = get_mongo_db(MONGO_MAPPER_DB)[collection_name]
+    deletion_ids = get_scheduled_ids(collection, deletion_threshold)
 
     for ids_chunk in split_to_chunks(deletion_ids, DELETION_CHUNK_SIZE):
         MarketCategory.objects.filter(
@@ -121,7 +195,7 @@ def delete_mp_category(deletion_threshold: datetime):
             deleted=True,
         ).delete()
 
-        conn.collection.delete_many({'id': {'$in': ids_chunk}})
+        delete_scheduled_ids(collection, ids_chunk)
 
 
 def delete_prepared_objects(deletion_threshold: Optional[datetime] = None):
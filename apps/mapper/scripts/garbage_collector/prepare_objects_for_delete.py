@@ -13,9 +13,16 @@ import os
 import sys
 import django
 
-from django.db import connection
+from django.db import connection, transaction
 from datetime import datetime
-from django.db.models import Count, QuerySet, Q
+from functools import lru_cache
+from typing import Iterator, List, Optional
+from django.db.models import QuerySet
+from pymongo import ASCENDING, UpdateOne
+from pymongo.client_session import ClientSession
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError
+from pymongo.database import Database
 from setproctitle import setproctitle
 
 sys.path.append('/home/server/b2basket/')
@@ -23,7 +30,6 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'b2basket.settings')
 django.setup()
 
 from apps.utils import run_checker                      # noqa e402
-from apps.utils.iterable_utils import split_to_chunks   # noqa
 from apps.utils import MongoConnMixin                   # noqa
 from apps.mapper.models import (                        # noqa
     MarketAttributeValueDictionary,
@@ -34,6 +40,7 @@ from apps.mapper.models import (                        # noqa
 )
 
 BASE_CHUNK_SIZE = 2000
+DUPLICATE_KEY_ERROR_CODE = 11000
 MONGO_MAPPER_DB = 'mapper'
 
 MP_VALUES_COLLECTION = "mp_sched_delete_attribute_value"                    # For MarketAttributeValue
@@ -42,55 +49,166 @@ MP_ATTRIBUTES_COLLECTION = "mp_sched_delete_attribute"                      # Fo
 MP_CATEGORY_ATTRIBUTE_COLLECTION = "mp_sched_delete_category_attribute"     # For MarketCategoryAttribute
 MP_CATEGORY_COLLECTION = "mp_sched_delete_category"                         # For MarketCategory
 
+MARK_CATEGORY_ATTRIBUTES_DELETED_SQL = """
+    UPDATE mapper_marketcategoryattribute
+    SET deleted = TRUE
+    WHERE deleted = FALSE
+    AND (
+        category_id IN (
+            SELECT id
+            FROM mapper_marketcategory
+            WHERE deleted = TRUE
+        )
+        OR attribute_id IN (
+            SELECT id
+            FROM mapper_marketattribute
+            WHERE deleted = TRUE
+        )
+    )
+"""
+MARK_ATTRIBUTES_DELETED_SQL = """
+    UPDATE mapper_marketattribute
+    SET deleted = TRUE
+    WHERE deleted = FALSE
+    AND NOT EXISTS (
+        SELECT 1
+        FROM mapper_marketcategoryattribute category_attribute
+        WHERE category_attribute.attribute_id = mapper_marketattribute.id
+        AND category_attribute.deleted = FALSE
+    )
+"""
+MARK_DICTIONARIES_DELETED_SQL = """
+    UPDATE mapper_marketattributevaluedictionary
+    SET deleted = TRUE
+    WHERE deleted = FALSE
+    AND NOT EXISTS (
+        SELECT 1
+        FROM mapper_marketattribute attribute
+        WHERE attribute.dictionary_id = mapper_marketattributevaluedictionary.id
+        AND attribute.deleted = FALSE
+    )
+"""
+MARK_VALUES_DELETED_SQL = """
+    UPDATE mapper_marketattributevalue
+    SET deleted = TRUE
+    WHERE deleted = FALSE
+    AND dictionary_id IN (
+        SELECT id
+        FROM mapper_marketattributevaluedictionary
+        WHERE deleted = TRUE
+    )
+"""
 
-def get_existing_mongo_ids(
-    object_ids,
-    conn: MongoConnMixin,
-    batch_size=100000
-):
-    existing_ids = set()
 
-    for i in range(0, len(object_ids), batch_size):
-        batch = object_ids[i:i + batch_size]
+GARBAGE_COLLECTIONS = (
+    MP_VALUES_COLLECTION,
+    MP_DICTIONARIES_COLLECTION,
+    MP_ATTRIBUTES_COLLECTION,
+    MP_CATEGORY_ATTRIBUTE_COLLECTION,
+    MP_CATEGORY_COLLECTION,
+)
 
-        existing_ids.update(
-            doc['id'] for doc in conn.collection.find(
-                {'id': {'$in': batch}},
-                {'id': 1, '_id': 0},
-            )
-        )
 
-    return existing_ids
+def ensure_garbage_indexes(db: Database):
+    """Create indexes used by garbage collector lookups.
 
+    Unique `id` index serves scheduling upserts, `(timestamp, id)` index
+    covers lookup of ids which deletion threshold is exceeded.
+    `create_index` is a no-op for already existing indexes.
+    """
+    for collection_name in GARBAGE_COLLECTIONS:
+        collection = db.get_collection(collection_name)
+        collection.create_index([('id', ASCENDING)], unique=True)
+        collection.create_index([('timestamp', ASCENDING), ('id', ASCENDING)])
 
-def mongo_garbage_insert(
-    objects: QuerySet,
+
+@lru_cache(maxsize=None)
+def get_mongo_db(db_name: str) -> Database:
+    """Get garbage collector mongo database.
+
+    One client is kept per process and db name, collections are switched
+    by name on it instead of reconnecting for every garbage collector step.
+    Garbage collections indexes are ensured once per process as well.
+    """
+    db = MongoConnMixin(db_name, MP_VALUES_COLLECTION).db
+    ensure_garbage_indexes(db)
+    return db
+
+
+def mark_objects_deleted(*statements: str):
+    """Run "deleted" flag updates in one transaction using one cursor."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def iter_id_chunks(objects: QuerySet, chunk_size: int) -> Iterator[List[int]]:
+    """Stream object ids in lists of `chunk_size` ids."""
+    ids_chunk = []
+    for object_id in objects.values_list('id', flat=True).iterator(
+        chunk_size=chunk_size,
+    ):
+        ids_chunk.append(object_id)
+        if len(ids_chunk) == chunk_size:
+            yield ids_chunk
+            ids_chunk = []
+
+    if ids_chunk:
+        yield ids_chunk
+
+
+def schedule_garbage(
+    collection: Collection,
+    object_ids: List[int],
     date_prepared: datetime,
-    collection_name: str,
-    db_name: str = None
+    session: Optional[ClientSession] = None,
 ):
-    conn = MongoConnMixin(db_name or MONGO_MAPPER_DB, collection_name)
+    """Schedule objects for delete, keeping already scheduled ones as is.
 
-    value_ids = list(objects.values_list('id', flat=True))
+    Upserts with `$setOnInsert` make rescheduling a no-op, so timestamp of
+    already scheduled object is not moved. Duplicate key errors can only
+    come from concurrent upserts of the same id and are skipped.
+    """
+    try:
+        collection.bulk_write(
+            [
+                UpdateOne(
+                    {'id': object_id},
+                    {'$setOnInsert': {'timestamp': date_prepared}},
+                    upsert=True,
+                )
+                for object_id in object_ids
+            ],
+            ordered=False,
+            session=session,
+        )
+    except BulkWriteError as error:
+        write_errors = error.details.get('writeErrors', [])
+        if any(
+            write_error['code'] != DUPLICATE_KEY_ERROR_CODE
+            for write_error in write_errors
+        ):
+            raise
 
-    already_in_mongo_ids = get_existing_mongo_ids(value_ids, conn)
 
-    deletion_objects = [
-        {
-            "id": value_id,
-            "timestamp": date_prepared,
-        }
-        for value_id in value_ids
-        if value_id not in already_in_mongo_ids
-    ]
+def mongo_garbage_insert(
+    objects: QuerySet,
+    date_prepared: datetime,
+    collection_name: str,
+    db_name: str = None,
+    session: Optional[ClientSession] = None,
+):
+    collection = get_mongo_db(db_name or MONGO_MAPPER_DB)[collection_name]
 
-    for chunk in split_to_chunks(deletion_objects, BASE_CHUNK_SIZE):
-        conn.collection.insert_many(chunk)
+    for ids_chunk in iter_id_chunks(objects, BASE_CHUNK_SIZE):
+        schedule_garbage(collection, ids_chunk, date_prepared, session)
 
 
 def prepare_mp_values(
     date_prepared: datetime,
     collection: str = MP_VALUES_COLLECTION,
+    mark_deleted: bool = True,
+    session: Optional[ClientSession] = None,
 ):
     """Prepare marketplace values.
 
@@ -100,28 +218,22 @@ def prepare_mp_values(
         `MarketAttributeValueDictionary.deleted=True`
     2. if `MarketAttributeValue.deleted=True`
     """
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            UPDATE mapper_marketattributevalue
-            SET deleted = TRUE
-            WHERE deleted = FALSE
-            AND dictionary_id IN (
-                SELECT id
-                FROM mapper_marketattributevaluedictionary
-                WHERE deleted = TRUE
-            )
-        """)
+    if mark_deleted:
+        mark_objects_deleted(MARK_VALUES_DELETED_SQL)
 
     mongo_garbage_insert(
         MarketAttributeValue.objects.filter(deleted=True),
         date_prepared,
         collection,
+        session=session,
     )
 
 
 def prepare_mp_dictionaries(
     date_prepared: datetime,
     collection: str = MP_DICTIONARIES_COLLECTION,
+    mark_deleted: bool = True,
+    session: Optional[ClientSession] = None,
 ):
     """Prepare marketplace dictionaries.
 
@@ -131,26 +243,22 @@ def prepare_mp_dictionaries(
         `MarketAttribute.deleted=True`
     2. if `MarketAttributeValueDictionary.deleted=True`
     """
-    MarketAttributeValueDictionary.objects.annotate(
-        attributes_count=Count(
-            'marketattribute',
-            filter=Q(marketattribute__deleted=False),
-        )
-    ).filter(
-        attributes_count=0,
-        deleted=False,
-    ).update(deleted=True)
+    if mark_deleted:
+        mark_objects_deleted(MARK_DICTIONARIES_DELETED_SQL)
 
     mongo_garbage_insert(
         MarketAttributeValueDictionary.objects.filter(deleted=True),
         date_prepared,
         collection,
+        session=session,
     )
 
 
 def prepare_mp_attributes(
     date_prepared: datetime,
     collection: str = MP_ATTRIBUTES_COLLECTION,
+    mark_deleted: bool = True,
+    session: Optional[ClientSession] = None,
 ):
     """Prepare marketplace attributes.
 
@@ -160,26 +268,22 @@ def prepare_mp_attributes(
         `MarketCategoryAttribute.deleted=True`
     2. if `MarketAttribute.deleted=True`
     """
-    MarketAttribute.objects.annotate(
-        attributes_count=Count(
-            'marketcategoryattribute',
-            filter=Q(marketcategoryattribute__deleted=False),
-        )
-    ).filter(
-        attributes_count=0,
-        deleted=False,
-    ).update(deleted=True)
+    if mark_deleted:
+        mark_objects_deleted(MARK_ATTRIBUTES_DELETED_SQL)
 
     mongo_garbage_insert(
         MarketAttribute.objects.filter(deleted=True),
         date_prepared,
         collection,
+        session=session,
     )
 
 
 def prepare_mp_category_attributes(
     date_prepared: datetime,
     collection: str = MP_CATEGORY_ATTRIBUTE_COLLECTION,
+    mark_deleted: bool = True,
+    session: Optional[ClientSession] = None,
 ):
     """Prepare marketplace category attribute.
 
@@ -189,21 +293,21 @@ def prepare_mp_category_attributes(
         `MarketCategory.deleted=True` OR `MarketAttribute.deleted=True`
     2. if `MarketCategoryAttribute.deleted=True`
     """
-    MarketCategoryAttribute.objects.filter(
-        Q(category__deleted=True) | Q(attribute__deleted=True),
-        deleted=False
-    ).update(deleted=True)
+    if mark_deleted:
+        mark_objects_deleted(MARK_CATEGORY_ATTRIBUTES_DELETED_SQL)
 
     mongo_garbage_insert(
         MarketCategoryAttribute.objects.filter(deleted=True),
         date_prepared,
         collection,
+        session=session,
     )
 
 
 def prepare_mp_category(
     date_prepared: datetime,
     collection: str = MP_CATEGORY_COLLECTION,
+    session: Optional[ClientSession] = None,
 ):
     """Prepare marketplace category.
 
@@ -215,10 +319,14 @@ def prepare_mp_category(
         MarketCategory.objects.filter(deleted=True),
         date_prepared,
         collection,
+        session=session,
     )
 
 
-def prepare_mapper_objects_for_deletion(prepared_date: datetime = None):
+def prepare_mapper_objects_for_deletion(
+    prepared_date: datetime = None,
+    session: Optional[ClientSession] = None,
+):
     """Algorythm:
 
     1. Process MarketCategory
@@ -253,14 +361,29 @@ def prepare_mapper_objects_for_deletion(prepared_date: datetime = None):
     """
     prepared_date = prepared_date or datetime.now()
 
-    prepare_mp_category(prepared_date)
-    prepare_mp_category_attributes(prepared_date)
-    prepare_mp_attributes(prepared_date)
-    prepare_mp_dictionaries(prepared_date)
-    prepare_mp_values(prepared_date)
+    # NOTE: all "deleted" flags are set in one transaction beforehand,
+    # cascade order is the same as processing order below
+    mark_objects_deleted(
+        MARK_CATEGORY_ATTRIBUTES_DELETED_SQL,
+        MARK_ATTRIBUTES_DELETED_SQL,
+        MARK_DICTIONARIES_DELETED_SQL,
+        MARK_VALUES_DELETED_SQL,
+    )
+
+    prepare_mp_category(prepared_date, session=session)
+    prepare_mp_category_attributes(
+        prepared_date, mark_deleted=False, session=session,
+    )
+    prepare_mp_attributes(prepared_date, mark_deleted=False, session=session)
+    prepare_mp_dictionaries(
+        prepared_date, mark_deleted=False, session=session,
+    )
+    prepare_mp_values(prepared_date, mark_deleted=False, session=session)
 
 
 if __name__ == "__main__":
     with run_checker('MapperGarbageCollectorPrepareObjects', no_kill=True):
         setproctitle('MapperGarbageCollectorPrepareObjects')
-        prepare_mapper_objects_for_deletion()
+        mongo_client = get_mongo_db(MONGO_MAPPER_DB).client
+        with mongo_client.start_session() as mongo_session:
+            prepare_mapper_objects_for_deletion(session=mongo_session)
@@ -1,6 +1,15 @@
 """Internal API serializers for mapper app."""
 
+import re
+from collections import OrderedDict, defaultdict
+from copy import copy
+from typing import Dict, List, Set, Tuple, Type
+
 from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from django.db.models import Manager, Model, Prefetch, QuerySet
 
 from apps.mapper.models import (
     AttributeMap,
@@ -17,12 +26,218 @@ from apps.mapper.models import (
     ValueMap,
     FeedMarketplaceSettings,
 )
+from apps.mapper.utils.optimized_queries import get_value_mapping_data
 
+from rest_framework.relations import RelatedField
 from rest_framework.serializers import ModelSerializer
 from rest_framework import serializers
 
 
-class CategoryMapSerializer(ModelSerializer):
+def get_mappings_prefetch(model: Type[Model], mappings: str) -> Prefetch:
+    """Prefetch model mappings together with data of their mapping data.
+
+    :param model: mapped model, e.g. FeedCategoryAttribute
+    :param str mappings: reverse accessor of mappings, e.g. attributemap_set
+    """
+    map_model = getattr(model, mappings).rel.related_model
+    return Prefetch(
+        mappings,
+        queryset=map_model.objects.select_related(
+            *map_model.MAPPING_DATA_RELATED,
+        ),
+    )
+
+
+class CachedFieldsModelSerializer(ModelSerializer):
+    """ModelSerializer that builds its fields once per serializer class.
+
+    `ModelSerializer.get_fields` introspects model and Meta on every
+    serializer instantiation. Result is stored on the class and every
+    instance gets shallow copies of cached fields, so binding a field to
+    a serializer instance does not touch the cached one.
+    """
+
+    def get_fields(self):
+        """Return copies of fields cached on the serializer class."""
+        cls = self.__class__
+        cached_fields = cls.__dict__.get('_cached_fields')
+        if cached_fields is None:
+            cached_fields = super().get_fields()
+            cls._cached_fields = cached_fields
+
+        return {
+            field_name: copy(field)
+            for field_name, field in cached_fields.items()
+        }
+
+    @classmethod
+    def get_eager_loading_lookups(cls) -> Tuple[Set[str], Set[str]]:
+        """Get related lookups needed to render serializer fields.
+
+        Field sources are walked over model relations, e.g.
+        `source='attribute.unit'` gives `attribute__unit` lookup. Forward
+        relations go to `select_related`, reverse and many-to-many ones
+        go to `prefetch_related`. Related fields render only pk stored on
+        the row itself, so their last relation is not joined.
+
+        :return: select_related lookups, prefetch_related lookups
+        """
+        cached_lookups = cls.__dict__.get('_eager_loading_lookups')
+        if cached_lookups is not None:
+            return cached_lookups
+
+        select_related: Set[str] = set()
+        prefetch_related: Set[str] = set()
+
+        for field in cls().fields.values():
+            source_attrs = field.source_attrs
+            if isinstance(field, RelatedField):
+                source_attrs = source_attrs[:-1]
+
+            opts = cls.Meta.model._meta
+            lookup: List[str] = []
+            many = False
+            for attr in source_attrs:
+                try:
+                    model_field = opts.get_field(attr)
+                except FieldDoesNotExist:
+                    break
+
+                if model_field.related_model is None:
+                    break
+
+                lookup.append(attr)
+                many = many or model_field.one_to_many or \
+                    model_field.many_to_many
+                opts = model_field.related_model._meta
+
+            if lookup:
+                lookups = prefetch_related if many else select_related
+                lookups.add('__'.join(lookup))
+
+        cls._eager_loading_lookups = select_related, prefetch_related
+        return cls._eager_loading_lookups
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Join or prefetch relations rendered by serializer fields."""
+        select_related, prefetch_related = cls.get_eager_loading_lookups()
+
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+
+        return cls.setup_mappings_loading(queryset)
+
+    @classmethod
+    def setup_mappings_loading(cls, queryset):
+        """Prefetch mappings read by `is_mapped` and `mapping_data`.
+
+        Serializer Meta may set `mappings` to reverse accessor of model
+        mappings, otherwise queryset is returned as is.
+        """
+        mappings = getattr(cls.Meta, 'mappings', None)
+        if mappings is None:
+            return queryset
+
+        return queryset.prefetch_related(
+            get_mappings_prefetch(cls.Meta.model, mappings),
+        )
+
+
+class ValueMappingDataListSerializer(serializers.ListSerializer):
+    """List serializer of attribute values rendered from plain rows.
+
+    Serializer fields are read with one `values_list` query and mapping
+    data of all values with another one, so neither model instances nor
+    per field serialization is involved. Child serializer Meta must set
+    `mappings` to values mappings accessor.
+    """
+
+    MAPPING_FIELDS = ('is_mapped', 'mapping_data')
+
+    def to_representation(self, data):
+        values = data.all() if isinstance(data, Manager) else data
+        if not isinstance(values, QuerySet) or \
+                values._result_cache is not None:
+            return super().to_representation(values)
+
+        meta = self.child.Meta
+        fields = [
+            field for field in meta.fields
+            if field not in self.MAPPING_FIELDS
+        ]
+        rows = [
+            dict(zip(fields, row))
+            for row in values.prefetch_related(None).values_list(*fields)
+        ]
+
+        # NOTE: filterable querysets are passed as subquery, so query text
+        # does not grow with number of values (MySQL can't LIMIT in IN)
+        if values.query.can_filter():
+            value_ids = values.values('id')
+        else:
+            value_ids = [row['id'] for row in rows]
+
+        # NOTE: value maps field referring to this list values
+        value_field = getattr(meta.model, meta.mappings).field
+        mapping_data_by_value = get_value_mapping_data(
+            by=value_field.attname,
+            **{f'{value_field.name}__in': value_ids},
+        )
+
+        for row in rows:
+            mapping_data = mapping_data_by_value.get(row['id'], [])
+            row['is_mapped'] = bool(mapping_data)
+            row['mapping_data'] = mapping_data
+
+        return [
+            OrderedDict((field, row[field]) for field in meta.fields)
+            for row in rows
+        ]
+
+
+def _set_category_map_ids(category_maps: List[CategoryMap]):
+    """Set ids of bulk created category maps on backends not returning them."""
+    ids = {
+        tuple(key): category_map_id
+        for category_map_id, *key in CategoryMap.objects.filter(
+            feed_category_id__in={
+                category_map.feed_category_id for category_map in category_maps
+            },
+            marketplace_category_id__in={
+                category_map.marketplace_category_id
+                for category_map in category_maps
+            },
+        ).values_list('id', 'feed_category_id', 'marketplace_category_id')
+    }
+    for category_map in category_maps:
+        category_map.pk = ids.get((
+            category_map.feed_category_id,
+            category_map.marketplace_category_id,
+        ))
+
+
+class CategoryMapListSerializer(serializers.ListSerializer):
+    """List serializer inserting category maps with batched INSERTs."""
+
+    BULK_CREATE_BATCH_SIZE = 1000
+
+    def create(self, validated_data):
+        category_maps = [CategoryMap(**item) for item in validated_data]
+        with transaction.atomic():
+            CategoryMap.objects.bulk_create(
+                category_maps,
+                batch_size=self.BULK_CREATE_BATCH_SIZE,
+            )
+            if any(category_map.pk is None for category_map in category_maps):
+                _set_category_map_ids(category_maps)
+        return category_maps
+
+
+class CategoryMapSerializer(CachedFieldsModelSerializer):
     """Serializer for CategoryMap model."""
 
     class Meta:
@@ -30,9 +245,10 @@ class CategoryMapSerializer(ModelSerializer):
 
         model = CategoryMap
         fields = '__all__'
+        list_serializer_class = CategoryMapListSerializer
 
 
-class AttributeMapSerializer(ModelSerializer):
+class AttributeMapSerializer(CachedFieldsModelSerializer):
     """Serializer for AttributeMap model."""
 
     class Meta:
@@ -42,7 +258,7 @@ class AttributeMapSerializer(ModelSerializer):
         fields = '__all__'
 
 
-class ValueMapSerializer(ModelSerializer):
+class ValueMapSerializer(CachedFieldsModelSerializer):
     """Serializer for ValueMap model."""
 
     class Meta:
@@ -52,7 +268,7 @@ class ValueMapSerializer(ModelSerializer):
         fields = '__all__'
 
 
-class FeedMetaSerializer(ModelSerializer):
+class FeedMetaSerializer(CachedFieldsModelSerializer):
     """Serializer for FeedMeta model."""
 
     class Meta:
@@ -76,7 +292,7 @@ class FeedMetaSerializer(ModelSerializer):
         ]
 
 
-class FeedMetaCustomSerializer(ModelSerializer):
+class FeedMetaCustomSerializer(CachedFieldsModelSerializer):
     """Serializer for FeedMeta model."""
 
     class Meta:
@@ -91,13 +307,14 @@ class FeedMetaCustomSerializer(ModelSerializer):
         )
 
 
-class FeedCategorySerializer(ModelSerializer):
+class FeedCategorySerializer(CachedFieldsModelSerializer):
     """Serializer for FeedCategory model."""
 
     class Meta:
         """Set model info."""
 
         model = FeedCategory
+        mappings = 'categorymap_set'
         fields = [
             'id',
             'feed',
@@ -119,7 +336,7 @@ class FeedCategorySerializer(ModelSerializer):
         ]
 
 
-class FeedCategoryListSerializer(ModelSerializer):
+class FeedCategoryListSerializer(CachedFieldsModelSerializer):
     """Serializer for FeedCategory model."""
 
     class Meta:
@@ -148,7 +365,7 @@ class FeedCategoryListSerializer(ModelSerializer):
         ]
 
 
-class FeedCategoryAttributeSerializer(ModelSerializer):
+class FeedCategoryAttributeSerializer(CachedFieldsModelSerializer):
     """Serializer for FeedCategoryAttribute model."""
 
     unit = serializers.CharField()
@@ -157,6 +374,7 @@ class FeedCategoryAttributeSerializer(ModelSerializer):
         """Set model info."""
 
         model = FeedCategoryAttribute
+        mappings = 'attributemap_set'
         fields = [
             'id',
             'category',
@@ -168,13 +386,14 @@ class FeedCategoryAttributeSerializer(ModelSerializer):
         ]
 
 
-class FeedCategoryAttributeValueSerializer(ModelSerializer):
+class FeedCategoryAttributeValueSerializer(CachedFieldsModelSerializer):
     """Serializer for FeedCategoryAttributeValue model."""
 
     class Meta:
         """Set model info."""
 
         model = FeedCategoryAttributeValue
+        mappings = 'valuemap_set'
         fields = [
             'id',
             'attribute',
@@ -183,9 +402,10 @@ class FeedCategoryAttributeValueSerializer(ModelSerializer):
             'is_mapped',
             'mapping_data',
         ]
+        list_serializer_class = ValueMappingDataListSerializer
 
 
-class MarketplaceSerializer(ModelSerializer):
+class MarketplaceSerializer(CachedFieldsModelSerializer):
     """Serializer for Marketplace view."""
 
     class Meta:
@@ -195,7 +415,7 @@ class MarketplaceSerializer(ModelSerializer):
         fields = '__all__'
 
 
-class MarketCategorySerializer(ModelSerializer):
+class MarketCategorySerializer(CachedFieldsModelSerializer):
     """Serializer for MarketCategory model."""
 
     class Meta:
@@ -212,8 +432,17 @@ class MarketCategorySerializer(ModelSerializer):
             'leaf',
         ]
 
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Load only serialized columns of (possibly large) category lists.
+
+        `parent` and `marketplace` are rendered as pks stored on the row,
+        so no joins are needed.
+        """
+        return super().setup_eager_loading(queryset).only(*cls.Meta.fields)
+
 
-class MarketCategoryAttributeSerializer(ModelSerializer):
+class MarketCategoryAttributeSerializer(CachedFieldsModelSerializer):
     """Serializer for MarketCategoryAttribute model."""
 
     name = serializers.CharField(source='attribute.name')
@@ -224,6 +453,7 @@ class MarketCategoryAttributeSerializer(ModelSerializer):
         """Set model info."""
 
         model = MarketCategoryAttribute
+        mappings = 'attributemap_set'
         fields = [
             'id',
             'category',
@@ -237,8 +467,29 @@ class MarketCategoryAttributeSerializer(ModelSerializer):
             'dictionary_id',
         ]
 
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Fetch attribute data rendered by serializer in the same query.
 
-class MarketAttributeSerializer(ModelSerializer):
+        Unlike the generic lookups, only columns serializer renders
+        are selected.
+        """
+        return cls.setup_mappings_loading(queryset).select_related(
+            'attribute',
+            'attribute__unit',
+        ).only(
+            'id',
+            'category_id',
+            'required',
+            'deleted',
+            'is_collection',
+            'attribute__name',
+            'attribute__unit__name',
+            'attribute__dictionary_id',
+        )
+
+
+class MarketAttributeSerializer(CachedFieldsModelSerializer):
     """Serializer for MarketAttribute model."""
 
     class Meta:
@@ -257,13 +508,14 @@ class MarketAttributeSerializer(ModelSerializer):
         ]
 
 
-class MarketAttributeValueSerializer(ModelSerializer):
+class MarketAttributeValueSerializer(CachedFieldsModelSerializer):
     """Serializer for MarketAttributeValue model."""
 
     class Meta:
         """Set model info."""
 
         model = MarketAttributeValue
+        mappings = 'valuemap_set'
         fields = [
             'id',
             'dictionary',
@@ -274,9 +526,105 @@ class MarketAttributeValueSerializer(ModelSerializer):
             'is_mapped',
             'mapping_data',
         ]
+        list_serializer_class = ValueMappingDataListSerializer
 
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Load only columns rendered by serializer."""
+        return super().setup_eager_loading(queryset).only(
+            'id',
+            'dictionary_id',
+            'value',
+            'info',
+            'picture_url',
+            'deleted',
+        )
+
+
+CONTENT_OBJECTS_CONTEXT_KEY = 'content_objects'
+SETTINGS_BULK_CREATE_BATCH_SIZE = 1000
+
+# NOTE: filled with all mapper models by `MapperConfig.ready`
+CONTENT_TYPE_MODELS: Dict[str, Type[Model]] = {}
+
+
+def get_content_type_model(content_type: str) -> Type[Model]:
+    """Get mapper model by its (case insensitive) class name.
+
+    :raises LookupError: if there is no such mapper model
+    """
+    model_name = str(content_type).lower()
+    model = CONTENT_TYPE_MODELS.get(model_name)
+    if model is None:
+        model = apps.get_model('mapper', model_name)
+        CONTENT_TYPE_MODELS[model_name] = model
+    return model
 
-class FeedMarketplaceSettingsSerializer(ModelSerializer):
+
+def get_content_objects(items) -> Dict[Tuple[Type[Model], int], Model]:
+    """Fetch content objects of settings items, one query per model."""
+    ids_by_model = defaultdict(set)
+    for item in items:
+        try:
+            model = get_content_type_model(item['content_type'])
+            ids_by_model[model].add(int(item['object_id']))
+        except (KeyError, LookupError, TypeError, ValueError):
+            # NOTE: invalid items are reported by item validation
+            continue
+
+    return {
+        (model, object_id): content_object
+        for model, ids in ids_by_model.items()
+        for object_id, content_object in model.objects.in_bulk(ids).items()
+    }
+
+
+def _set_settings_ids(settings: List[FeedMarketplaceSettings]):
+    """Set ids of bulk created settings on backends not returning them."""
+    ids = {
+        tuple(key): setting_id
+        for setting_id, *key in FeedMarketplaceSettings.objects.filter(
+            feed_id__in={s.feed_id for s in settings},
+            marketplace_id__in={s.marketplace_id for s in settings},
+        ).values_list(
+            'id', 'feed_id', 'marketplace_id', 'content_type_id', 'object_id',
+        )
+    }
+    for setting in settings:
+        setting.pk = ids.get((
+            setting.feed_id,
+            setting.marketplace_id,
+            setting.content_type_id,
+            setting.object_id,
+        ))
+
+
+class FeedMarketplaceSettingsListSerializer(serializers.ListSerializer):
+    """List serializer resolving settings content objects in bulk."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.context[CONTENT_OBJECTS_CONTEXT_KEY] = get_content_objects(
+                data,
+            )
+        return super().to_internal_value(data)
+
+    def create(self, validated_data):
+        """Insert settings with batched INSERTs instead of one per item."""
+        settings = [
+            FeedMarketplaceSettings(**item) for item in validated_data
+        ]
+        with transaction.atomic():
+            FeedMarketplaceSettings.objects.bulk_create(
+                settings,
+                batch_size=SETTINGS_BULK_CREATE_BATCH_SIZE,
+            )
+            if any(setting.pk is None for setting in settings):
+                _set_settings_ids(settings)
+        return settings
+
+
+class FeedMarketplaceSettingsSerializer(CachedFieldsModelSerializer):
     """Serializer for FeedMarketplaceSettings model."""
 
     content_type = serializers.SerializerMethodField()
@@ -285,6 +633,7 @@ class FeedMarketplaceSettingsSerializer(ModelSerializer):
         model = FeedMarketplaceSettings
         fields = '__all__'
         read_only_fields = ('content_type', 'object_id')
+        list_serializer_class = FeedMarketplaceSettingsListSerializer
 
     def to_internal_value(self, data):
         def _get_item_ret(_data):
@@ -301,28 +650,68 @@ class FeedMarketplaceSettingsSerializer(ModelSerializer):
             return ret
 
         if isinstance(data, list):
-            return map(_get_item_ret, data)
+            self.context[CONTENT_OBJECTS_CONTEXT_KEY] = get_content_objects(
+                data,
+            )
+            return [_get_item_ret(_data) for _data in data]
 
         return _get_item_ret(data)
 
     def validate(self, data):
         object_id = data.pop('object_id')
-        content_type = f'mapper.{data.pop("content_type")}'
-
-        model = apps.get_model(content_type)
+        content_type = data.pop('content_type')
 
         try:
-            content_object = model.objects.get(id=object_id)
-        except model.DoesNotExist:
+            model = get_content_type_model(content_type)
+            object_id = int(object_id)
+        except (LookupError, TypeError, ValueError):
             raise serializers.ValidationError('Not found')
+
+        content_objects = self.context.get(CONTENT_OBJECTS_CONTEXT_KEY)
+        if content_objects is None:
+            content_object = model.objects.filter(id=object_id).first()
         else:
-            data['content_object'] = content_object
+            content_object = content_objects.get((model, object_id))
+
+        if content_object is None:
+            raise serializers.ValidationError('Not found')
 
+        data['content_object'] = content_object
         return data
 
     def create(self, validate_data):
         return FeedMarketplaceSettings.objects.create(**validate_data)
 
     def get_content_type(self, instance):
-        return instance.content_object.__class__.__name__
+        # NOTE: content types are cached by manager, content object is not
+        content_type = ContentType.objects.get_for_id(instance.content_type_id)
+        return content_type.model_class().__name__
+
+
+EMAIL_REGEX = re.compile(
+    r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b',
+)
+
+
+def is_email_valid(email: str) -> bool:
+    """Check if email str is valid."""
+    return EMAIL_REGEX.fullmatch(email) is not None
+
+
+class MapperReportEmailSerializer(serializers.Serializer):
+    """Serializer for emails to send mapper report to.
+
+    `email` is a space separated emails string, validated data holds
+    list of its valid emails.
+    """
+
+    email = serializers.CharField()
 
+    def validate_email(self, value: str) -> List[str]:
+        emails = value.split()
+        valid_emails = [email for email in emails if is_email_valid(email)]
+        if not valid_emails:
+            raise serializers.ValidationError(
+                f'All provided emails are invalid. {emails}',
+            )
+        return valid_emails
@@ -9,119 +9,101 @@ from celery import (
 from apps.utils.scripts.run_parser import run_parser
 
 
-@shared_task
-def run_first_mapper_feed_parser():
-    """Celery task for first feed parsing."""
-    current_dir = Path(__file__).parent
-    scripts_dir = current_dir / Path('parsing')
-    script = 'first_mapper_feed_parser.py'
-    return run_parser(scripts_dir.as_posix(), script)
-
-
-@shared_task
-def run_mapper_feed_parser():
-    """Celery task for feed parsing."""
-    current_dir = Path(__file__).parent
-    scripts_dir = current_dir / Path('parsing')
-    script = 'mapper_feed_parser.py'
-    return run_parser(scripts_dir.as_posix(), script)
-
-
-@shared_task
-def run_feed_categories_fetcher():
-    """Celery task for feed categories fetcher."""
-    current_dir = Path(__file__).parent
-    scripts_dir = current_dir / Path('fetchers') / Path('feed')
-    script = 'feed_categories_fetcher.py'
-    return run_parser(scripts_dir.as_posix(), script)
-
-
-@shared_task
-def run_feed_attributes_fetcher():
-    """Celery task for feed attributes fetcher."""
-    current_dir = Path(__file__).parent
-    scripts_dir = current_dir / Path('fetchers') / Path('feed')
-    script = 'feed_attributes_fetcher.py'
-    return run_parser(scripts_dir.as_posix(), script)
-
-
-@shared_task
-def run_ozon_categories_fetcher():
-    """Celery task for Ozon categories fetcher."""
-    current_dir = Path(__file__).parent
-    scripts_dir = current_dir / Path('fetchers') / Path('ozon')
-    script = 'ozon_categories_fetcher.py'
-    return run_parser(scripts_dir.as_posix(), script)
-
-
-@shared_task
-def run_ozon_attributes_fetcher():
-    """Celery task for Ozon attributes fetcher."""
-    current_dir = Path(__file__).parent
-    scripts_dir = current_dir / Path('fetchers') / Path('ozon')
-    script = 'ozon_attributes_fetcher.py'
-    return run_parser(scripts_dir.as_posix(), script)
-
-
-@shared_task
-def run_ozon_values_fetcher():
-    """Celery task for Ozon values fetcher."""
-    current_dir = Path(__file__).parent
-    scripts_dir = current_dir / Path('fetchers') / Path('ozon')
-    script = 'ozon_values_fetcher.py'
-    return run_parser(scripts_dir.as_posix(), script)
-
-
-@shared_task
-def run_wildberries_categories_fetcher():
-    """Celery task for Wildberries categories fetcher."""
-    current_dir = Path(__file__).parent
-    scripts_dir = current_dir / Path('fetchers') / Path('wildberries')
-    script = 'wildberries_categories_fetcher.py'
-    return run_parser(scripts_dir.as_posix(), script)
-
-
-@shared_task
-def run_wildberries_attributes_fetcher():
-    """Celery task for Wildberries attributes fetcher."""
-    current_dir = Path(__file__).parent
-    scripts_dir = current_dir / Path('fetchers') / Path('wildberries')
-    script = 'wildberries_attributes_fetcher.py'
-    return run_parser(scripts_dir.as_posix(), script)
-
-
-@shared_task
-def run_wildberries_values_fetcher():
-    """Celery task for Wildberries values fetcher."""
-    current_dir = Path(__file__).parent
-    scripts_dir = current_dir / Path('fetchers') / Path('wildberries')
-    script = 'wildberries_values_fetcher.py'
-    return run_parser(scripts_dir.as_posix(), script)
-
-
-@shared_task
-def run_mapper_report_to_mail_automatic():
-    """Celery task for automatic mapper report"""
-    current_dir = Path(__file__).parent
-    scripts_dir = current_dir / Path('reports') / Path('scripts')
-    script = 'mapper_report_automatic.py'
-    return run_parser(scripts_dir.as_posix(), script)
-
-
-@shared_task
-def run_garbage_collector_prepare_objects():
-    current_dir = Path(__file__).parent
-    scripts_dir = current_dir / Path('scripts') / Path('garbage_collector')
-    script = 'prepare_objects_for_delete.py'
-    return run_parser(scripts_dir.as_posix(), script)
-
-
-@shared_task
-def run_garbage_collector_delete_objects():
-    current_dir = Path(__file__).parent
-    scripts_dir = current_dir / Path('scripts') / Path('garbage_collector')
-    script = 'delete_outdated_objects.py'
-    return run_parser(scripts_dir.as_posix(), script)
+BASE_DIR = Path(__file__).parent
+PARSING_DIR = (BASE_DIR / 'parsing').as_posix()
+FEED_FETCHERS_DIR = (BASE_DIR / 'fetchers' / 'feed').as_posix()
+OZON_FETCHERS_DIR = (BASE_DIR / 'fetchers' / 'ozon').as_posix()
+WILDBERRIES_FETCHERS_DIR = (BASE_DIR / 'fetchers' / 'wildberries').as_posix()
+REPORT_SCRIPTS_DIR = (BASE_DIR / 'reports' / 'scripts').as_posix()
+GARBAGE_COLLECTOR_DIR = (BASE_DIR / 'scripts' / 'garbage_collector').as_posix()
+
+
+def make_script_task(task_name: str, scripts_dir: str, script: str, doc=None):
+    """Make celery task running script from scripts dir in subprocess."""
+    def run_script():
+        return run_parser(scripts_dir, script)
+
+    run_script.__name__ = run_script.__qualname__ = task_name
+    run_script.__doc__ = doc
+    return shared_task(name=f'{__name__}.{task_name}')(run_script)
+
+
+run_first_mapper_feed_parser = make_script_task(
+    'run_first_mapper_feed_parser',
+    PARSING_DIR,
+    'first_mapper_feed_parser.py',
+    'Celery task for first feed parsing.',
+)
+run_mapper_feed_parser = make_script_task(
+    'run_mapper_feed_parser',
+    PARSING_DIR,
+    'mapper_feed_parser.py',
+    'Celery task for feed parsing.',
+)
+run_feed_categories_fetcher = make_script_task(
+    'run_feed_categories_fetcher',
+    FEED_FETCHERS_DIR,
+    'feed_categories_fetcher.py',
+    'Celery task for feed categories fetcher.',
+)
+run_feed_attributes_fetcher = make_script_task(
+    'run_feed_attributes_fetcher',
+    FEED_FETCHERS_DIR,
+    'feed_attributes_fetcher.py',
+    'Celery task for feed attributes fetcher.',
+)
+run_ozon_categories_fetcher = make_script_task(
+    'run_ozon_categories_fetcher',
+    OZON_FETCHERS_DIR,
+    'ozon_categories_fetcher.py',
+    'Celery task for Ozon categories fetcher.',
+)
+run_ozon_attributes_fetcher = make_script_task(
+    'run_ozon_attributes_fetcher',
+    OZON_FETCHERS_DIR,
+    'ozon_attributes_fetcher.py',
+    'Celery task for Ozon attributes fetcher.',
+)
+run_ozon_values_fetcher = make_script_task(
+    'run_ozon_values_fetcher',
+    OZON_FETCHERS_DIR,
+    'ozon_values_fetcher.py',
+    'Celery task for Ozon values fetcher.',
+)
+run_wildberries_categories_fetcher = make_script_task(
+    'run_wildberries_categories_fetcher',
+    WILDBERRIES_FETCHERS_DIR,
+    'wildberries_categories_fetcher.py',
+    'Celery task for Wildberries categories fetcher.',
+)
+run_wildberries_attributes_fetcher = make_script_task(
+    'run_wildberries_attributes_fetcher',
+    WILDBERRIES_FETCHERS_DIR,
+    'wildberries_attributes_fetcher.py',
+    'Celery task for Wildberries attributes fetcher.',
+)
+run_wildberries_values_fetcher = make_script_task(
+    'run_wildberries_values_fetcher',
+    WILDBERRIES_FETCHERS_DIR,
+    'wildberries_values_fetcher.py',
+    'Celery task for Wildberries values fetcher.',
+)
+run_mapper_report_to_mail_automatic = make_script_task(
+    'run_mapper_report_to_mail_automatic',
+    REPORT_SCRIPTS_DIR,
+    'mapper_report_automatic.py',
+    'Celery task for automatic mapper report',
+)
+run_garbage_collector_prepare_objects = make_script_task(
+    'run_garbage_collector_prepare_objects',
+    GARBAGE_COLLECTOR_DIR,
+    'prepare_objects_for_delete.py',
+)
+run_garbage_collector_delete_objects = make_script_task(
+    'run_garbage_collector_delete_objects',
+    GARBAGE_COLLECTOR_DIR,
+    'delete_outdated_objects.py',
+)
 
 
 @shared_task
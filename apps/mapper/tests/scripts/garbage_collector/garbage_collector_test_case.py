@@ -1,9 +1,8 @@
 """Class for testing garbage collector."""
-from typing import Dict, Union
+from typing import Dict, Iterable, Iterator, Set, Tuple, Union
 from datetime import datetime
 
 from django.db import transaction
-from django.db.models import QuerySet
 from django.test import TestCase
 
 from apps.mapper.models import (
@@ -29,8 +28,42 @@ ObjectModelName = str
 ObjectDict = Dict[str, Union[int, str, float]]
 ObjectId = int
 State = Dict[ObjectModelName, Dict[ObjectId, ObjectDict]]
+StateStream = Iterable[Tuple[ObjectModelName, Iterable[ObjectDict]]]
 
 MONGO_MAPPER_TEST_DB = 'mapper_test'
+STATE_CHUNK_SIZE = 2000
+MONGO_PRINT_BATCH_SIZE = 1000
+
+# NOTE: garbage collector only marks objects deleted and deletes them,
+# so state keeps identity, relations and flags, not free text payload
+STATE_MODELS = {
+    'marketplaces': (
+        Marketplace,
+        ('id', 'marketplace', 'client', 'client_id'),
+    ),
+    'mp_categories': (
+        MarketCategory,
+        ('id', 'marketplace_id', 'parent_id', 'name', 'source_id',
+         'deleted', 'updated', 'leaf'),
+    ),
+    'mp_attributes': (
+        MarketAttribute,
+        ('id', 'dictionary_id', 'unit_id', 'name', 'source_id', 'deleted',
+         'updated'),
+    ),
+    'mp_category_attributes': (
+        MarketCategoryAttribute,
+        ('id', 'category_id', 'attribute_id', 'deleted'),
+    ),
+    'mp_dictionaries': (
+        MarketAttributeValueDictionary,
+        ('id', 'source_id', 'name', 'deleted'),
+    ),
+    'mp_values': (
+        MarketAttributeValue,
+        ('id', 'dictionary_id', 'source_id', 'value', 'deleted'),
+    ),
+}
 
 
 class GarbageCollectorTestCase(TestCase):
@@ -38,45 +71,103 @@ class GarbageCollectorTestCase(TestCase):
     state_first: State = None
     deletion_threshold: datetime = None
 
-    @staticmethod
-    def _print_mongo_state():
-        """Used for debug purposes."""
-        conn = MongoConnMixin(MONGO_MAPPER_TEST_DB, 'test')
+    cpu_dict_value_ids: Set[ObjectId] = None
+    gpu_dict_value_ids: Set[ObjectId] = None
+    cpu_cat_attr_id: ObjectId = None
+    gpu_cat_attr_ids: Set[ObjectId] = None
+
+    _mongo_conn: MongoConnMixin = None
+
+    @classmethod
+    def get_mongo_conn(cls) -> MongoConnMixin:
+        """Get mongo connection shared by all test cases."""
+        if cls._mongo_conn is None:
+            cls._mongo_conn = MongoConnMixin(MONGO_MAPPER_TEST_DB, 'test')
+        return cls._mongo_conn
 
-        values_col = getattr(conn.db, MP_VALUES_COLLECTION)
-        dicts_col = getattr(conn.db, MP_DICTIONARIES_COLLECTION)
-        attrs_col = getattr(conn.db, MP_ATTRIBUTES_COLLECTION)
-        cat_attrs_col = getattr(conn.db, MP_CATEGORY_ATTRIBUTE_COLLECTION)
-        category_col = getattr(conn.db, MP_CATEGORY_COLLECTION)
+    @classmethod
+    def _print_mongo_state(cls):
+        """Used for debug purposes."""
+        get_collection = cls.get_mongo_conn().db.get_collection
 
         from pprint import pprint
 
         pprint({
-            'values': list(values_col.find({}, {'_id': 0})),
-            'dicts': list(dicts_col.find({}, {'_id': 0})),
-            'attrs': list(attrs_col.find({}, {'_id': 0})),
-            'cat_attrs': list(cat_attrs_col.find({}, {'_id': 0})),
-            'category': list(category_col.find({}, {'_id': 0})),
+            name: list(
+                get_collection(collection_name).find(
+                    {}, {'_id': 0},
+                ).batch_size(MONGO_PRINT_BATCH_SIZE)
+            )
+            for name, collection_name in (
+                ('values', MP_VALUES_COLLECTION),
+                ('dicts', MP_DICTIONARIES_COLLECTION),
+                ('attrs', MP_ATTRIBUTES_COLLECTION),
+                ('cat_attrs', MP_CATEGORY_ATTRIBUTE_COLLECTION),
+                ('category', MP_CATEGORY_COLLECTION),
+            )
         })
 
-    @staticmethod
-    def drop_test_db():
-        conn = MongoConnMixin(MONGO_MAPPER_TEST_DB, 'test')
+    @classmethod
+    def drop_test_db(cls):
+        conn = cls.get_mongo_conn()
         conn.client.drop_database(MONGO_MAPPER_TEST_DB)
 
     @classmethod
     def setUpClass(cls):
         super(GarbageCollectorTestCase, cls).setUpClass()
 
+    @classmethod
+    def tearDownClass(cls):
+        super(GarbageCollectorTestCase, cls).tearDownClass()
+        if cls._mongo_conn is not None:
+            cls._mongo_conn.client.close()
+            cls._mongo_conn = None
+
+    @classmethod
+    def setUpTestData(cls):
+        """Load fixtures and cache their baseline once per test class."""
+        cls.load_mappings_atomic()
+        cls.state_first = cls.get_current_state()
+
+        attributes = {
+            attr['name']: attr
+            for attr in cls.state_first['mp_attributes'].values()
+        }
+        cpu_manufacturer = attributes['cpu_manufacturer']
+        gpu_manufacturer = attributes['gpu_manufacturer']
+        gpu_category_id = next(
+            category['id']
+            for category in cls.state_first['mp_categories'].values()
+            if category['name'] == 'gpu'
+        )
+
+        values = cls.state_first['mp_values'].values()
+        cls.cpu_dict_value_ids = {
+            value['id'] for value in values
+            if value['dictionary_id'] == cpu_manufacturer['dictionary_id']
+        }
+        cls.gpu_dict_value_ids = {
+            value['id'] for value in values
+            if value['dictionary_id'] == gpu_manufacturer['dictionary_id']
+        }
+
+        category_attributes = cls.state_first['mp_category_attributes']
+        cls.cpu_cat_attr_id = next(
+            cat_attr['id'] for cat_attr in category_attributes.values()
+            if cat_attr['attribute_id'] == cpu_manufacturer['id']
+        )
+        cls.gpu_cat_attr_ids = {
+            cat_attr['id'] for cat_attr in category_attributes.values()
+            if cat_attr['category_id'] == gpu_category_id
+        }
+
     def setUp(self):
-        self.load_mappings()
-        self.state_first = self.get_current_state()
         self.deletion_threshold = datetime.now()
 
     def get_base_differences(self) -> dict:
         return self.get_state_differences(
             self.state_first,
-            self.get_current_state(),
+            self.iter_current_state(),
         )
 
     @staticmethod
@@ -103,178 +194,209 @@ class GarbageCollectorTestCase(TestCase):
 
         return template
 
-    def get_state_differences(self, state_first: State, state_second: State):
-        diff = self.get_diff_template()
-
-        for model_name, objects in state_second.items():
-            diff["added"].setdefault(model_name, {})
-            diff["changed"].setdefault(model_name, {})
-
-            for obj_id, obj_data in objects.items():
-                if model_name in state_first and obj_id in state_first[model_name]:
-                    original_data = state_first[model_name][obj_id]
-                    changes = {k: v for k, v in obj_data.items() if original_data.get(k) != v}
+    def get_state_differences(
+        self,
+        state_first: State,
+        state_second: Union[State, StateStream],
+    ):
+        """Diff two states, streaming objects of the second one.
+
+        Only first state is kept in memory, objects of the second state
+        are compared one at a time and dropped unless they differ.
+        """
+        if isinstance(state_second, dict):
+            state_second = (
+                (model_name, objects.values())
+                for model_name, objects in state_second.items()
+            )
 
-                    if changes:
-                        diff["changed"][model_name][obj_id] = changes
-                else:
-                    diff["added"][model_name][obj_id] = obj_data
+        diff = self.get_diff_template()
+        compared_models = set()
+
+        for model_name, objects in state_second:
+            compared_models.add(model_name)
+            objects_first = state_first.get(model_name, {})
+            common_ids = set()
+            added = {}
+            changed = {}
+
+            for obj_data in objects:
+                obj_id = obj_data['id']
+                original_data = objects_first.get(obj_id)
+
+                if original_data is None:
+                    added[obj_id] = obj_data
+                    continue
+
+                common_ids.add(obj_id)
+                if obj_data == original_data:
+                    continue
+
+                changes = {
+                    k: v for k, v in obj_data.items()
+                    if original_data.get(k) != v
+                }
+                if changes:
+                    changed[obj_id] = changes
+
+            removed = objects_first.keys() - common_ids
+
+            for key, objs in (
+                ('added', added),
+                ('removed', removed),
+                ('changed', changed),
+            ):
+                if objs:
+                    diff[key][model_name] = objs
 
         for model_name, objects in state_first.items():
-            diff["removed"].setdefault(model_name, set())
-
-            for obj_id, obj_data in objects.items():
-                if model_name not in state_second or obj_id not in state_second[model_name]:
-                    diff["removed"][model_name].add(obj_id)
-
-        for key in ["added", "removed", "changed"]:
-            diff[key] = {
-                model: objs
-                for model, objs in diff[key].items()
-                if objs
-            }
+            if model_name not in compared_models and objects:
+                diff['removed'][model_name] = set(objects)
 
         return diff
 
     @staticmethod
-    def get_current_state() -> State:
-        marketplaces = Marketplace.objects.all().values()
-        mp_categories = MarketCategory.objects.all().values()
-        mp_attributes = MarketAttribute.objects.all().values()
-        mp_category_attributes = MarketCategoryAttribute.objects.all().values()
-        mp_dictionaries = MarketAttributeValueDictionary.objects.all().values()
-        mp_values = MarketAttributeValue.objects.all().values()
-
-        def _id_dicts(objects: QuerySet) -> Dict[ObjectId, ObjectDict]:
-            return {obj['id']: obj for obj in objects}
+    def iter_current_state() -> Iterator[
+        Tuple[ObjectModelName, Iterator[ObjectDict]]
+    ]:
+        """Stream current objects of every model without caching them."""
+        for model_name, (model, columns) in STATE_MODELS.items():
+            yield model_name, model.objects.values(*columns).iterator(
+                chunk_size=STATE_CHUNK_SIZE,
+            )
 
+    @classmethod
+    def get_current_state(cls) -> State:
         return {
-            'marketplaces': _id_dicts(marketplaces),
-            'mp_categories': _id_dicts(mp_categories),
-            'mp_attributes': _id_dicts(mp_attributes),
-            'mp_category_attributes': _id_dicts(mp_category_attributes),
-            'mp_dictionaries': _id_dicts(mp_dictionaries),
-            'mp_values': _id_dicts(mp_values),
+            model_name: {obj['id']: obj for obj in objects}
+            for model_name, objects in cls.iter_current_state()
         }
 
-    def load_mappings_atomic(self):
+    @classmethod
+    def load_mappings_atomic(cls):
         with transaction.atomic():
-            self.load_mappings()
+            cls.load_mappings()
 
     @staticmethod
-    def load_mappings():
-        """Make mapping data to cover all testing situations."""
-
-        undelete_defaults = {"defaults": {"deleted": False}}
-
-        # Marketplace objects creation
-        mp, _ = Marketplace.objects.update_or_create(
-            id=1,
-            marketplace=Marketplace.OZON,
-            client_id=1,
-            defaults={'api_key': 'test'}
-        )
-
-        mp_parent_category, _ = MarketCategory.objects.update_or_create(
-            id=1,
-            marketplace=mp,
-            name='pc components',
-            source_id='1',
-            **undelete_defaults,
+    def _bulk_upsert(model, objects, update_fields=()):
+        """Create missing objects and update existing ones by id."""
+        existing_ids = set(model.objects.filter(
+            id__in=[obj.id for obj in objects],
+        ).values_list('id', flat=True))
+
+        model.objects.bulk_create(
+            [obj for obj in objects if obj.id not in existing_ids],
         )
 
-        mp_gpu, _ = MarketCategory.objects.update_or_create(
-            id=2,
-            marketplace=mp,
-            parent=mp_parent_category,
-            name='gpu',
-            source_id='2',
-            **undelete_defaults,
-        )
+        existing = [obj for obj in objects if obj.id in existing_ids]
+        if existing and update_fields:
+            model.objects.bulk_update(existing, update_fields)
 
-        mp_cpu, _ = MarketCategory.objects.update_or_create(
-            id=3,
-            marketplace=mp,
-            parent=mp_parent_category,
-            name='cpu',
-            source_id='3',
-            **undelete_defaults,
-        )
+    @classmethod
+    def load_mappings(cls):
+        """Make mapping data to cover all testing situations."""
 
-        # COMMON POWER CONSUMPTION
-        # yeah, must be not dict choices attribute but numeric value, blah blah
-        watts_unit, _ = ValueUnit.objects.get_or_create(id=1, name='watts')
-        mp_power_con, _ = MarketAttribute.objects.update_or_create(
-            id=1,
-            name='power consumption',
-            source_id='1',
-            unit=watts_unit,
-            **undelete_defaults,
-        )
-        MarketCategoryAttribute.objects.update_or_create(
-            id=1,
-            category=mp_gpu,
-            attribute=mp_power_con,
-            **undelete_defaults,
-        )
-        MarketCategoryAttribute.objects.update_or_create(
-            id=2,
-            category=mp_cpu,
-            attribute=mp_power_con,
-            **undelete_defaults,
-        )
+        undelete = {'deleted': False}
 
-        # CPU MANUFACTURER
-        cpu_manuf_dict, _ = MarketAttributeValueDictionary.objects.update_or_create(
-            id=1,
-            source_id='1',
-            **undelete_defaults,
-        )
-        MarketAttributeValue.objects.update_or_create(
-            id=1, dictionary=cpu_manuf_dict, value='intel', **undelete_defaults,
-        )
-        MarketAttributeValue.objects.update_or_create(
-            id=2, dictionary=cpu_manuf_dict, value='amd', **undelete_defaults,
-        )
-        cpu_manuf, _ = MarketAttribute.objects.update_or_create(
-            id=2,
-            name='cpu_manufacturer',
-            source_id='2',
-            dictionary=cpu_manuf_dict,
-            **undelete_defaults,
-        )
-        MarketCategoryAttribute.objects.update_or_create(
-            id=3,
-            category=mp_cpu,
-            attribute=cpu_manuf,
-            **undelete_defaults,
-        )
+        # Marketplace objects creation
+        cls._bulk_upsert(Marketplace, [
+            Marketplace(
+                id=1,
+                marketplace=Marketplace.OZON,
+                client_id=1,
+                api_key='test',
+            ),
+        ], ['api_key'])
+
+        cls._bulk_upsert(MarketCategory, [
+            MarketCategory(
+                id=1,
+                marketplace_id=1,
+                name='pc components',
+                source_id='1',
+                **undelete,
+            ),
+            MarketCategory(
+                id=2,
+                marketplace_id=1,
+                parent_id=1,
+                name='gpu',
+                source_id='2',
+                **undelete,
+            ),
+            MarketCategory(
+                id=3,
+                marketplace_id=1,
+                parent_id=1,
+                name='cpu',
+                source_id='3',
+                **undelete,
+            ),
+        ], ['deleted'])
 
-        # GPU MANUFACTURER
-        gpu_manuf_dict, _ = MarketAttributeValueDictionary.objects.update_or_create(
-            id=2,
-            source_id='2',
-            **undelete_defaults,
-        )
-        MarketAttributeValue.objects.update_or_create(
-            id=3, dictionary=gpu_manuf_dict, value='intel', **undelete_defaults,
-        )
-        MarketAttributeValue.objects.update_or_create(
-            id=4, dictionary=gpu_manuf_dict, value='amd', **undelete_defaults,
-        )
-        MarketAttributeValue.objects.update_or_create(
-            id=5, dictionary=gpu_manuf_dict, value='nvidia', **undelete_defaults,
-        )
-        gpu_manuf, _ = MarketAttribute.objects.update_or_create(
-            id=3,
-            name='gpu_manufacturer',
-            source_id='3',
-            dictionary=gpu_manuf_dict,
-            **undelete_defaults,
-        )
-        MarketCategoryAttribute.objects.update_or_create(
-            id=4,
-            category=mp_gpu,
-            attribute=gpu_manuf,
-            **undelete_defaults,
-        )
+        # yeah, must be not dict choices attribute but numeric value, blah blah
+        cls._bulk_upsert(ValueUnit, [ValueUnit(id=1, name='watts')])
+
+        # 1 - CPU MANUFACTURER, 2 - GPU MANUFACTURER
+        cls._bulk_upsert(MarketAttributeValueDictionary, [
+            MarketAttributeValueDictionary(id=1, source_id='1', **undelete),
+            MarketAttributeValueDictionary(id=2, source_id='2', **undelete),
+        ], ['deleted'])
+
+        cls._bulk_upsert(MarketAttributeValue, [
+            MarketAttributeValue(
+                id=1, dictionary_id=1, value='intel', **undelete,
+            ),
+            MarketAttributeValue(
+                id=2, dictionary_id=1, value='amd', **undelete,
+            ),
+            MarketAttributeValue(
+                id=3, dictionary_id=2, value='intel', **undelete,
+            ),
+            MarketAttributeValue(
+                id=4, dictionary_id=2, value='amd', **undelete,
+            ),
+            MarketAttributeValue(
+                id=5, dictionary_id=2, value='nvidia', **undelete,
+            ),
+        ], ['deleted'])
+
+        cls._bulk_upsert(MarketAttribute, [
+            # COMMON POWER CONSUMPTION
+            MarketAttribute(
+                id=1,
+                name='power consumption',
+                source_id='1',
+                unit_id=1,
+                **undelete,
+            ),
+            MarketAttribute(
+                id=2,
+                name='cpu_manufacturer',
+                source_id='2',
+                dictionary_id=1,
+                **undelete,
+            ),
+            MarketAttribute(
+                id=3,
+                name='gpu_manufacturer',
+                source_id='3',
+                dictionary_id=2,
+                **undelete,
+            ),
+        ], ['deleted'])
+
+        cls._bulk_upsert(MarketCategoryAttribute, [
+            MarketCategoryAttribute(
+                id=1, category_id=2, attribute_id=1, **undelete,
+            ),
+            MarketCategoryAttribute(
+                id=2, category_id=3, attribute_id=1, **undelete,
+            ),
+            MarketCategoryAttribute(
+                id=3, category_id=3, attribute_id=2, **undelete,
+            ),
+            MarketCategoryAttribute(
+                id=4, category_id=2, attribute_id=3, **undelete,
+            ),
+        ], ['deleted'])
@@ -48,11 +48,10 @@ class DeleteOutdatedObjectsTest(GarbageCollectorTestCase):
         self.mongo_db_delete_patch.stop()
 
     def test_process_mp_attribute_values(self):
-        cpu_dict = MarketAttribute.objects.get(name='cpu_manufacturer').dictionary
-
-        cpu_manufacturers = MarketAttributeValue.objects.filter(dictionary=cpu_dict)
-        cpu_manufacturers_ids = set(cpu_manufacturers.values_list('id', flat=True))
-        cpu_manufacturers.update(deleted=True)
+        cpu_manufacturers_ids = self.cpu_dict_value_ids
+        MarketAttributeValue.objects.filter(
+            id__in=cpu_manufacturers_ids,
+        ).update(deleted=True)
 
         prepare_mp_values(self.deletion_threshold)
         delete_mp_attribute_values(self.deletion_threshold+timedelta(hours=1))
@@ -72,19 +71,11 @@ class DeleteOutdatedObjectsTest(GarbageCollectorTestCase):
         cpu_dict = cpu_attr.dictionary
         cpu_dict_id = cpu_dict.id
 
-        cpu_category_attribute_id = MarketCategoryAttribute.objects.get(
-            attribute_id=cpu_attr_id,
-        ).id
-
-        cpu_manufacturer_values = MarketAttributeValue.objects.filter(
-            dictionary=cpu_dict,
-        )
-        cpu_manufacturer_values_ids = set(
-            cpu_manufacturer_values.values_list('id', flat=True),
-        )
+        cpu_category_attribute_id = self.cpu_cat_attr_id
+        cpu_manufacturer_values_ids = self.cpu_dict_value_ids
 
         cpu_attr.delete()
-        cpu_manufacturer_values.delete()
+        MarketAttributeValue.objects.filter(dictionary=cpu_dict).delete()
 
         # add dict to mongo; delete dict, that does not have values
         prepare_mapper_objects_for_deletion(self.deletion_threshold)
@@ -108,11 +99,8 @@ class DeleteOutdatedObjectsTest(GarbageCollectorTestCase):
 
         cpu_manuf_dict_id = cpu_manufacturer_attr.dictionary_id
 
-        cpu_cat_attr = MarketCategoryAttribute.objects.get(
-            attribute_id=cpu_manufacturer_attr.id,
-        )
-        cpu_cat_attr_id = cpu_cat_attr.id
-        cpu_cat_attr.delete()
+        cpu_cat_attr_id = self.cpu_cat_attr_id
+        MarketCategoryAttribute.objects.filter(id=cpu_cat_attr_id).delete()
 
         prepare_mapper_objects_for_deletion(self.deletion_threshold)
         delete_mp_attributes(self.deletion_threshold + timedelta(hours=1))
@@ -121,9 +109,8 @@ class DeleteOutdatedObjectsTest(GarbageCollectorTestCase):
             changed={
                 'mp_dictionaries': {cpu_manuf_dict_id: {'deleted': True}},
                 'mp_values': {
-                    value.id: {'deleted': True} for value
-                    in MarketAttributeValue.objects.filter(
-                        dictionary_id=cpu_manuf_dict_id)
+                    value_id: {'deleted': True}
+                    for value_id in self.cpu_dict_value_ids
                 }
             },
             removed={
@@ -141,29 +128,15 @@ class DeleteOutdatedObjectsTest(GarbageCollectorTestCase):
         gpu_category = MarketCategory.objects.get(name='gpu')
         self._set_deleted(gpu_category)
 
-        removed_cat_attrs_ids = set(
-            MarketCategoryAttribute.objects.filter(
-                category_id=gpu_category.id,
-            ).values_list('id', flat=True)
-        )
-        cpu_manufacturer_category_attribute_id = MarketCategoryAttribute.objects.get(
-            attribute__name='cpu_manufacturer',
-        ).id
-        removed_cat_attrs_ids.add(cpu_manufacturer_category_attribute_id)
+        removed_cat_attrs_ids = self.gpu_cat_attr_ids | {self.cpu_cat_attr_id}
 
         cpu_manufacturer_dict_id = cpu_manufacturer.dictionary_id
-        cpu_manufacturer_value_ids = MarketAttributeValue.objects.filter(
-            dictionary_id=cpu_manufacturer_dict_id
-        ).values_list('id', flat=True)
 
         gpu_manufacturer = MarketAttribute.objects.get(name='gpu_manufacturer')
         gpu_manufacturer_dict_id = gpu_manufacturer.dictionary_id
-        gpu_manufacturer_value_ids = MarketAttributeValue.objects.filter(
-            dictionary_id=gpu_manufacturer_dict_id
-        ).values_list('id', flat=True)
 
         cpu_gpu_manufacture_value_ids = (
-            list(cpu_manufacturer_value_ids) + list(gpu_manufacturer_value_ids)
+            self.cpu_dict_value_ids | self.gpu_dict_value_ids
         )
 
         prepare_mapper_objects_for_deletion(self.deletion_threshold)
@@ -197,11 +170,8 @@ class DeleteOutdatedObjectsTest(GarbageCollectorTestCase):
         gpu_category_id = gpu_category.id
         self._set_deleted(gpu_category)
 
-        gpu_attributes = MarketCategoryAttribute.objects.filter(
-            category_id=gpu_category.id,
-        )
-        gpu_attr_ids = set(gpu_attributes.values_list('id', flat=True))
-        gpu_attributes.delete()
+        gpu_attr_ids = self.gpu_cat_attr_ids
+        MarketCategoryAttribute.objects.filter(id__in=gpu_attr_ids).delete()
 
         prepare_mp_category(self.deletion_threshold)
         delete_mp_category(self.deletion_threshold+timedelta(hours=1))
@@ -4,6 +4,9 @@ from unittest.mock import (
     MagicMock,
 )
 
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
 from apps.mapper.models import (
     MarketAttributeValueDictionary,
     MarketAttributeValue,
@@ -17,6 +20,9 @@ from apps.mapper.scripts.garbage_collector.prepare_objects_for_delete import (
     MP_ATTRIBUTES_COLLECTION,
     MP_CATEGORY_ATTRIBUTE_COLLECTION,
     MP_CATEGORY_COLLECTION,
+    DUPLICATE_KEY_ERROR_CODE,
+    get_mongo_db,
+    schedule_garbage,
     mongo_garbage_insert,
     prepare_mp_values,
     prepare_mp_dictionaries,
@@ -54,33 +60,50 @@ class PrepareObjectsForDeleteTest(GarbageCollectorTestCase):
 
         mock_conn_instance = MagicMock()
         mock_mongo_conn.return_value = mock_conn_instance
-        mock_conn_instance.collection.find.return_value = [{'id': 1}]
+        mock_collection = mock_conn_instance.db.__getitem__.return_value
 
+        get_mongo_db.cache_clear()
         mongo_garbage_insert(
             deletion_objects,
             self.deletion_threshold,
             collection_name,
         )
+        get_mongo_db.cache_clear()
 
-        mock_conn_instance.collection.find.assert_called_once_with(
-            {
-                'id': {
-                    '$in': deletion_objects_ids,
-                },
-            },
-            {'id': 1, '_id': 0},
+        mock_conn_instance.db.__getitem__.assert_called_once_with(
+            collection_name,
         )
-
-        expected_chunk = [
-            {"id": 2, "timestamp": self.deletion_threshold},
-            {"id": 3, "timestamp": self.deletion_threshold},
-        ]
-        mock_conn_instance.collection.insert_many.assert_called_once_with(
-            expected_chunk,
+        mock_collection.find.assert_not_called()
+
+        mock_collection.bulk_write.assert_called_once_with(
+            [
+                UpdateOne(
+                    {'id': object_id},
+                    {'$setOnInsert': {'timestamp': self.deletion_threshold}},
+                    upsert=True,
+                )
+                for object_id in deletion_objects_ids
+            ],
+            ordered=False,
+            session=None,
         )
 
         mock_market_value_dict.delete()
 
+    def test_schedule_garbage_skips_duplicates(self):
+        mock_collection = MagicMock()
+
+        mock_collection.bulk_write.side_effect = BulkWriteError({
+            'writeErrors': [{'code': DUPLICATE_KEY_ERROR_CODE}],
+        })
+        schedule_garbage(mock_collection, [1], self.deletion_threshold)
+
+        mock_collection.bulk_write.side_effect = BulkWriteError({
+            'writeErrors': [{'code': DUPLICATE_KEY_ERROR_CODE}, {'code': 1}],
+        })
+        with self.assertRaises(BulkWriteError):
+            schedule_garbage(mock_collection, [1], self.deletion_threshold)
+
     @patch('apps.mapper.scripts.garbage_collector.prepare_objects_for_delete.mongo_garbage_insert')
     def test_process_values(self, mock_mongo_garbage_insert):
         cpu_manuf_dict = MarketAttributeValueDictionary.objects.get(id=1)
@@ -67,64 +67,68 @@ nested_mapping_router.register(
 )
 
 
+feed_urlpatterns = [
+     path('<int:feed_id>/categories',
+          FeedCategoryView.as_view(),
+          name='feed_categories'),
+     path('categories/<int:category_id>',
+          FeedCategoryByIdView.as_view(),
+          name='feed_category_by_id'),
+     path('categories/<int:category_id>/attributes',
+          FeedCategoryAttributeView.as_view(),
+          name='feed_category_attributes'),
+     path('categories/<int:category_id>/attribute_names',
+          FeedCategoryAttributeNameView.as_view(),
+          name='feed_category_attribute_names'),
+     path(('categories/<int:category_id>/market/<int:market_id>/'
+           'attribute_names'),
+          FeedCategoryMarketAttributeNameView.as_view(),
+          name='feed_category_market_attribute_names'),
+     path('categories/attributes/<int:attribute_id>',
+          FeedCategoryAttributeByIdView.as_view(),
+          name='feed_category_attribute_by_id'),
+     path('categories/attributes/<int:attribute_id>/values',
+          FeedCategoryAttributeValueView.as_view(),
+          name='feed_category_attribute_value'),
+     path('categories/attributes/values/<int:value_id>',
+          FeedCategoryAttributeValueByIdView.as_view(),
+          name='feed_category_attribute_value_by_id'),
+     path('<int:feed_id>/marketplace/<int:marketplace_id>/report/',
+          FeedMappingReportView.as_view(),
+          name='feed_marketplace_mapping_report'),
+     path('<int:from_feed_id>/copy',
+          FeedMappingsCopyView.as_view(),
+          name='feed_copy_mappings'),
+]
+
+marketplace_urlpatterns = [
+     path('<int:marketplace_id>/categories',
+          MarketCategoryView.as_view(),
+          name='market_categories'),
+     path('categories/<int:category_id>',
+          MarketCategoryByIdView.as_view(),
+          name='market_category_by_id'),
+     path('categories/<int:category_id>/attributes',
+          MarketCategoryAttributeView.as_view(),
+          name='market_category_attributes'),
+     path('categories/<int:category_id>/attributes_values',
+          MarketplaceCategoryAttributesAndValues.as_view(),
+          name='market_category_attributes_and_values_update'),
+     path('categories/attributes/<int:attribute_id>',
+          MarketCategoryAttributeByIdView.as_view(),
+          name='market_category_attribute_by_id'),
+     path('categories/attributes/<int:attribute_id>/values',
+          MarketAttributeValueView.as_view(),
+          name='market_category_attribute_values'),
+     path('categories/attributes/values/<int:value_id>',
+          MarketAttributeValueByIdView.as_view(),
+          name='market_category_attribute_value_by_id'),
+]
+
 urlpatterns = [
      path('mapper/', include([
-          path('feed/', include([
-               path('<feed_id>/categories',
-                    FeedCategoryView.as_view(),
-                    name='feed_categories'),
-               path('categories/<category_id>',
-                    FeedCategoryByIdView.as_view(),
-                    name='feed_category_by_id'),
-               path('categories/<category_id>/attributes',
-                    FeedCategoryAttributeView.as_view(),
-                    name='feed_category_attributes'),
-               path('categories/<category_id>/attribute_names',
-                    FeedCategoryAttributeNameView.as_view(),
-                    name='feed_category_attribute_names'),
-               path(('categories/<category_id>/market/<market_id>/'
-                     'attribute_names'),
-                    FeedCategoryMarketAttributeNameView.as_view(),
-                    name='feed_category_attribute_names'),
-               path('categories/attributes/<attribute_id>',
-                    FeedCategoryAttributeByIdView.as_view(),
-                    name='feed_category_attribute_by_id'),
-               path('categories/attributes/<attribute_id>/values',
-                    FeedCategoryAttributeValueView.as_view(),
-                    name='feed_category_attribute_value'),
-               path('categories/attributes/values/<value_id>',
-                    FeedCategoryAttributeValueByIdView.as_view(),
-                    name='feed_category_attribute_value_by_id'),
-               path('<feed_id>/marketplace/<marketplace_id>/report/',
-                    FeedMappingReportView.as_view(),
-                    name='feed_marketplace_mapping_report'),
-               path('<from_feed_id>/copy',
-                    FeedMappingsCopyView.as_view(),
-                    name='feed_copy_mappings'),
-               ])),
-          path('marketplace/', include([
-               path('<marketplace_id>/categories',
-                    MarketCategoryView.as_view(),
-                    name='market_categories'),
-               path('categories/<category_id>',
-                    MarketCategoryByIdView.as_view(),
-                    name='market_category_by_id'),
-               path('categories/<category_id>/attributes',
-                    MarketCategoryAttributeView.as_view(),
-                    name='market_category_attributes'),
-               path('categories/<category_id>/attributes_values',
-                    MarketplaceCategoryAttributesAndValues.as_view(),
-                    name='market_category_attributes_and_values_update'),
-               path('categories/attributes/<attribute_id>',
-                    MarketCategoryAttributeByIdView.as_view(),
-                    name='market_category_attribute_by_id'),
-               path('categories/attributes/<attribute_id>/values',
-                    MarketAttributeValueView.as_view(),
-                    name='market_category_attribute_values'),
-               path('categories/attributes/values/<value_id>',
-                    MarketAttributeValueByIdView.as_view(),
-                    name='market_category_attribute_value_by_id'),
-               ])),
+          path('feed/', include(feed_urlpatterns)),
+          path('marketplace/', include(marketplace_urlpatterns)),
           path('', include(router.urls)),
           path('', include(mapping_router.urls)),
           path('', include(nested_mapping_router.urls)),
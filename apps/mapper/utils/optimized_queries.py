@@ -1,19 +1,142 @@
 """Module with optimized queries for mapper."""
 
-from typing import Dict, List, Any, Optional
-from collections import (
-    OrderedDict,
-    defaultdict,
-)
+from typing import Dict, List, Any
+from operator import itemgetter
+from collections import defaultdict
 
 from apps.mapper.models import (
     FeedCategory,
     CategoryMap,
+    MarketCategory,
+    ValueMap,
 )
+from apps.mapper.utils.utils import make_marketplace_category_tree
 
 CategoryId = int
 CategoryInfo = Dict[CategoryId, Dict[str, Any]]
 
+CATEGORIES_CHUNK_SIZE = 2000
+SOURCE_CATEGORY_ID = -1
+
+# NOTE: mapping data key -> CategoryMap lookup
+CATEGORY_MAPPING_DATA_FIELDS = {
+    'mapping_id': 'id',
+    'feed_id': 'feed_category__feed_id',
+    'feed_category_id': 'feed_category_id',
+    'feed_category': 'feed_category__name',
+    'marketplace_id': 'marketplace_category__marketplace_id',
+    'marketplace_category_id': 'marketplace_category__id',
+    'marketplace_category': 'marketplace_category__name',
+    'marketplace_category_deleted': 'marketplace_category__deleted',
+}
+
+# NOTE: mapping data key -> FeedCategory lookup through its category maps
+FEED_CATEGORY_MAPPING_DATA_FIELDS = {
+    'mapping_id': 'categorymap__id',
+    'feed_id': 'feed_id',
+    'feed_category_id': 'id',
+    'feed_category': 'name',
+    'marketplace_id': 'categorymap__marketplace_category__marketplace_id',
+    'marketplace_category_id': 'categorymap__marketplace_category_id',
+    'marketplace_category': 'categorymap__marketplace_category__name',
+    'marketplace_category_deleted':
+        'categorymap__marketplace_category__deleted',
+}
+
+# NOTE: mapping data key -> ValueMap lookup
+VALUE_MAPPING_DATA_FIELDS = {
+    'mapping_id': 'id',
+    'feed_id': 'attribute_map__category_map__feed_category__feed_id',
+    'feed_attribute_value_id': 'feed_attribute_value_id',
+    'feed_attribute_value': 'feed_attribute_value__value',
+    'marketplace_id':
+        'attribute_map__category_map__marketplace_category__marketplace_id',
+    'marketplace_attribute_value_id': 'marketplace_attribute_value_id',
+    'marketplace_attribute_value': 'marketplace_attribute_value__value',
+    'attribute_mapping_id': 'attribute_map_id',
+    'marketplace_attribute_info': 'marketplace_attribute_value__info',
+    'marketplace_attribute_picture_url':
+        'marketplace_attribute_value__picture_url',
+    'deleted': 'marketplace_attribute_value__deleted',
+}
+
+# NOTE: market category tree key -> MarketCategory lookup
+MARKET_CATEGORY_TREE_FIELDS = {
+    'id': 'id',
+    'marketplace': 'marketplace_id',
+    'parent': 'parent_id',
+    'name': 'name',
+    'deleted': 'deleted',
+    'updated': 'updated',
+    'leaf': 'leaf',
+}
+
+MAPPING_DATA_KEYS = tuple(CATEGORY_MAPPING_DATA_FIELDS)
+CATEGORY_MAP_LOOKUPS = tuple(CATEGORY_MAPPING_DATA_FIELDS.values())
+get_feed_category_mapping_values = itemgetter(
+    *(FEED_CATEGORY_MAPPING_DATA_FIELDS[key] for key in MAPPING_DATA_KEYS),
+)
+FEED_CATEGORY_TREE_FIELDS = tuple(dict.fromkeys([
+    'id',
+    'feed_id',
+    'parent_id',
+    'name',
+    'deleted',
+    'source_id',
+    *FEED_CATEGORY_MAPPING_DATA_FIELDS.values(),
+]))
+
+
+def get_category_mapping_data(
+    **category_map_filters,
+) -> Dict[CategoryId, List[Dict[str, Any]]]:
+    """Get mapping data of feed categories with a single query.
+
+    Same data as `CategoryMap.get_mapping_data` gives for each mapping,
+    without fetching related objects per mapping.
+
+    :param category_map_filters: CategoryMap filters, e.g. feed categories
+    :return: mapping data by feed category id, mapped categories only
+    :rtype: Dict[int, List[Dict[str, Any]]]
+    """
+    category_maps = CategoryMap.objects.filter(
+        **category_map_filters,
+    ).values_list(*CATEGORY_MAP_LOOKUPS)
+
+    mapping_data_by_category = defaultdict(list)
+    for category_map in category_maps:
+        mapping_data = dict(zip(MAPPING_DATA_KEYS, category_map))
+        mapping_data_by_category[mapping_data['feed_category_id']].append(
+            mapping_data,
+        )
+
+    return mapping_data_by_category
+
+
+def get_value_mapping_data(
+    by: str,
+    **value_map_filters,
+) -> Dict[int, List[Dict[str, Any]]]:
+    """Get mapping data of attribute values with a single query.
+
+    Same data as `ValueMap.get_mapping_data` gives for each mapping.
+
+    :param str by: mapping data key to group by, e.g. value id key
+    :param value_map_filters: ValueMap filters, e.g. mapped values
+    :return: mapping data grouped by `by` key value, mapped values only
+    :rtype: Dict[int, List[Dict[str, Any]]]
+    """
+    value_maps = ValueMap.objects.filter(
+        **value_map_filters,
+    ).values_list(*VALUE_MAPPING_DATA_FIELDS.values())
+
+    mapping_data_by_value = defaultdict(list)
+    for value_map in value_maps:
+        mapping_data = dict(zip(VALUE_MAPPING_DATA_FIELDS, value_map))
+        mapping_data_by_value[mapping_data[by]].append(mapping_data)
+
+    return mapping_data_by_value
+
 
 def get_feed_category_tree_data(feed_id: int) -> List[Dict[str, Any]]:
     """Get category tree data for mapper feed view.
@@ -26,82 +149,98 @@ def get_feed_category_tree_data(feed_id: int) -> List[Dict[str, Any]]:
     :return: category tree data
     :rtype: List[Dict[str, Any]]
     """
-    categories = FeedCategory.objects.filter(feed=feed_id)
-
-    if not categories:
+    # NOTE: one row per category mapping, or per category if not mapped
+    rows = FeedCategory.objects.filter(feed_id=feed_id).values(
+        *FEED_CATEGORY_TREE_FIELDS,
+    ).order_by(
+        'id',
+        'categorymap__id',
+    ).iterator(chunk_size=CATEGORIES_CHUNK_SIZE)
+
+    category_by_id = {}
+    has_source_category = False
+    for row in rows:
+        category = category_by_id.get(row['id'])
+        if category is None:
+            category = category_by_id[row['id']] = {
+                'id': row['id'],
+                'feed': row['feed_id'],
+                'parent': row['parent_id'],
+                'name': row['name'],
+                'deleted': row['deleted'],
+                'is_mapped': False,
+                'mapping_data': [],
+                'source_id': row['source_id'],
+                'children': [],
+            }
+            has_source_category = has_source_category or \
+                row['source_id'] == SOURCE_CATEGORY_ID
+
+        if row['categorymap__id'] is not None:
+            category['is_mapped'] = True
+            category['mapping_data'].append(dict(zip(
+                MAPPING_DATA_KEYS,
+                get_feed_category_mapping_values(row),
+            )))
+
+    if not has_source_category:
         return []
 
-    category_by_id = {
-        category.id: OrderedDict([
-            ('id', category.id),
-            ('feed', category.feed_id),
-            ('parent', category.parent_id),
-            ('name', category.name),
-            ('deleted', category.deleted),
-            ('is_mapped', False),
-            ('mapping_data', []),
-            ('source_id', category.source_id),
-            ('children', []),
-        ])
-        for category in categories
-    }
+    # NOTE: categories are shared between dicts, so appending a category
+    # to its parent children builds the whole tree in a single pass
+    root_categories = []
+    for category in category_by_id.values():
+        if category['parent'] is None:
+            root_categories.append(category)
+            continue
 
-    category_maps = CategoryMap.objects.filter(
-        feed_category_id__in=category_by_id,
-    ).values(
-        'id',
-        'feed_category__feed_id',
-        'feed_category_id',
-        'feed_category__name',
-        'marketplace_category__marketplace_id',
-        'marketplace_category__id',
-        'marketplace_category__name',
-        'marketplace_category__deleted',
-    )
+        parent_category = category_by_id.get(category['parent'])
+        if parent_category is not None:
+            parent_category['children'].append(category)
 
-    for category_map in category_maps:
-        mapping_data = {
-            'mapping_id': category_map['id'],
-            'feed_id': category_map['feed_category__feed_id'],
-            'feed_category_id': category_map['feed_category_id'],
-            'feed_category': category_map['feed_category__name'],
-            'marketplace_id': category_map['marketplace_category__marketplace_id'],
-            'marketplace_category_id': category_map['marketplace_category__id'],
-            'marketplace_category': category_map['marketplace_category__name'],
-            'marketplace_category_deleted': category_map['marketplace_category__deleted'],
-        }
-
-        category_by_id[category_map['feed_category_id']]['is_mapped'] = True
-        category_by_id[category_map['feed_category_id']]['mapping_data'].append(mapping_data)
-
-    source_category = [
-        category for category in category_by_id.values()
-        if category['source_id'] == -1
-    ][0]
-
-    if not source_category:
-        return []
+    return root_categories
+
+
+def get_market_category_tree_data(
+    marketplace_id: int,
+) -> List[Dict[str, Any]]:
+    """Get category tree data for mapper marketplace view.
+
+    Same data as `MarketCategorySerializer` gives, read as plain rows,
+    since serializer fields are too slow for thousands of categories.
 
-    categories_by_parent = defaultdict(list)
-    for category_id, category_data in category_by_id.items():
-        categories_by_parent[category_data['parent']].append(category_data)
-
-    def _get_subcategories(
-        parent_category_id: Optional[int] = None,
-    ) -> List[Dict[str, Any]]:
-        """Recursively get subcategories for category.
-
-        :param Optional[int] parent_category_id: MySQL Category ID
-
-        :return: category with subcategories
-        :rtype: Dict[str, Any]
-        """
-        return [
-            OrderedDict([   # NOTE: adding "children" attribute without losing an order
-                *[(k, v) for k, v in category.items()],
-                ('children', _get_subcategories(category['id']))
-            ])
-            for category in categories_by_parent[parent_category_id]
-        ]
-
-    return _get_subcategories()
+    :param int marketplace_id: marketplace id in MySQL
+    :return: category tree data, empty if marketplace has no categories
+    :rtype: List[Dict[str, Any]]
+    """
+    rows = MarketCategory.objects.filter(
+        marketplace=marketplace_id,
+    ).values_list(
+        *MARKET_CATEGORY_TREE_FIELDS.values(),
+    ).iterator(chunk_size=CATEGORIES_CHUNK_SIZE)
+
+    return make_marketplace_category_tree([
+        dict(zip(MARKET_CATEGORY_TREE_FIELDS, row)) for row in rows
+    ])
+
+
+def get_feed_category_descendant_ids(category_id: int) -> List[int]:
+    """Get ids of feed category and all its not deleted descendants.
+
+    Tree is walked level by level, one query per tree level instead of
+    one per category.
+
+    :param int category_id: root feed category id
+    :return: root category id and its descendant ids
+    :rtype: List[int]
+    """
+    category_ids = [category_id]
+    parent_ids = [category_id]
+    while parent_ids:
+        parent_ids = list(FeedCategory.objects.filter(
+            parent_id__in=parent_ids,
+            deleted=False,
+        ).values_list('id', flat=True))
+        category_ids.extend(parent_ids)
+
+    return category_ids
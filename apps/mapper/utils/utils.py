@@ -1,14 +1,15 @@
 """Mapper utils."""
 
-import operator
-from functools import reduce
+from copy import copy
+from functools import lru_cache
+from itertools import chain
 from collections import defaultdict
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
-from django.db.models import QuerySet
+from django.db.models import Model, Prefetch, QuerySet
 from django.db.models.functions import Upper
 from django.utils import timezone
-from django.db import transaction
+from django.db import IntegrityError, connection, transaction
 
 from apps.mapper.models import (
     FeedCategory,
@@ -29,29 +30,29 @@ from apps.mapper.models import (
 
 Categories = List[Dict[str, Union[str, int]]]
 
+NORMALIZED_STRINGS_CACHE_SIZE = 8192
+COPY_MAPPING_BATCH_SIZE = 1000
+VALUES_CHUNK_SIZE = 5000
 
-def get_feed_ids() -> List[int]:
-    """Get list of feed ids from MySQL."""
-    feed_ids = FeedMeta.objects.filter(
+
+def get_feed_ids() -> QuerySet:
+    """Get feed ids from MySQL, lazy flat values queryset."""
+    return FeedMeta.objects.filter(
         deleted=False,
         parsed=True,
     ).values_list('id', flat=True)
 
-    return feed_ids
-
 
-def get_feed_sql_categories(deleted: bool = None) -> List[int]:
-    """Get MySQL feed categories"""
+def get_feed_sql_categories(deleted: bool = None) -> QuerySet:
+    """Get MySQL feed category source ids, lazy flat values queryset."""
     filters: Dict = {}
 
     if deleted is not None:
         filters['deleted'] = deleted
 
-    sql_categories = FeedCategory.objects.filter(
+    return FeedCategory.objects.filter(
         **filters).values_list('source_id', flat=True)
 
-    return sql_categories
-
 
 def get_market_categories(
     marketplace_id: int,
@@ -143,177 +144,93 @@ def create_market_attribute_dict(
 
 
 def make_marketplace_category_tree(categories):
-    """Make category tree."""
+    """Make category tree.
+
+    Categories are linked to their children in place, without recursion.
+    """
     categories_by_parent = defaultdict(list)
     for category in categories:
         categories_by_parent[category['parent']].append(category)
 
-    def _make_tree(parent_id=None):
-        return [
-            {**c, 'children': _make_tree(c['id'])}
-            for c in categories_by_parent[parent_id]
-        ]
+    for category in categories:
+        category['children'] = categories_by_parent.get(category['id'], [])
 
-    return _make_tree()
+    return categories_by_parent[None]
 
 
 def flatten(lst: List[List]) -> List:
     """Flatten list of lists."""
-    return reduce(operator.iconcat, lst, [])
+    return list(chain.from_iterable(lst))
 
 
 def uniquify(lst: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """Uniquify dicts in list."""
-    res = [
-        dict(y) for y
-        in {tuple(x.items()) for x in lst}
-    ]
-
-    return res
-
-
-feed_attr_id = int
-mp_attr_id = int
-attr_map_id = int
-value_mapping = Dict[attr_map_id, Dict[feed_attr_id, mp_attr_id]]
-unmapped_values = Dict[attr_map_id, Dict[str, List[Tuple[int, str]]]]
-
-
-@transaction.atomic
-def create_val_mappings(
-    val_mappings: value_mapping,
-):
-    """Create value mappings."""
-    for map_id, val_mapping in val_mappings.items():
-        for feed_val, mp_val in val_mapping.items():
-
-            ValueMap.objects.get_or_create(
-                attribute_map_id=map_id,
-                feed_attribute_value_id=feed_val,
-                marketplace_attribute_value_id=mp_val,
-            )
-
-
-def get_equal_values(unmapped_dict: unmapped_values) -> value_mapping:
-    """Get equal values for provided unmapped values."""
-    mapping: value_mapping = {}
-
-    for attribute_map_id, values in unmapped_dict.items():
-
-        if not (
-            values.get('mp_values')
-            and values.get('unmapped_feed_values')
-        ):
-            continue
-
-        for feed_value in values['unmapped_feed_values']:
-            for mp_value in values['mp_values']:
-
-                if feed_value[1] == mp_value[1]:
-                    mapping.setdefault(
-                        attribute_map_id,
-                        {},
-                    )[feed_value[0]] = mp_value[0]
-
-                    break
-
-    return mapping
-
-
-def get_both_values_for_unmapped(feed_id: int) -> unmapped_values:
-    """Get dict with unmapped values and MP values for it.
-
-    :param int feed_id: mapper feed id
-
-    :return unmapped_values
-    :rtype Dict[int, Dict[str, List[Tuple[int, str]]]]
-
-    return example:
-    {
-        attribute_map_id1: {
-            'mp_values': [(id1, 'value1'), (id2, 'value2')]
-            'unmapped_feed_values': [(id1, 'value1'), (id2, 'value2')]
-        },
-        attribute_map_id2: {
-            'mp_values': [(id1, 'value1'), (id2, 'value2')]
-            'unmapped_feed_values': [(id1, 'value1'), (id2, 'value2')]
-        },
-    }
-    """
-    attr_maps_unfiltered = AttributeMap.objects.filter(
-        feed_attribute__category__feed_id=feed_id,
-        marketplace_attribute__attribute__map_equal_values=True,
-    )
+    """Uniquify dicts in list, keeping first of equal dicts in order."""
+    unique = {}
+    for x in lst:
+        unique.setdefault(tuple(x.items()), x)
 
-    attr_maps = [
-        attr_map for attr_map in attr_maps_unfiltered
-        if all([
-            attr_map.marketplace_attribute.attribute.map_equal_values,
-            attr_map.marketplace_attribute.attribute.dictionary_id,
-        ])
-    ]
-
-    unmapped_values_dict: unmapped_values = {}
-    feed_attr_ids: List[int] = []
-    mp_attributes_dict_ids: Dict[int, int] = {}
-
-    for attr_map in attr_maps:
-        feed_attr_ids.append(attr_map.feed_attribute_id)  # type: ignore
-        mp_attributes_dict_ids[attr_map.id] = (  # type: ignore
-            attr_map.marketplace_attribute.attribute.dictionary_id
-        )
-
-    mapped_feed_values_ids = ValueMap.objects.filter(
-        attribute_map_id__in=mp_attributes_dict_ids.keys(),
-    ).values_list('feed_attribute_value', flat=True)
-
-    unmapped_feed_values = FeedCategoryAttributeValue.objects.filter(
-        attribute_id__in=feed_attr_ids,
-    ).exclude(
-        id__in=mapped_feed_values_ids,
-    ).annotate(
-        value_upper=Upper('value'),
-    ).values_list('attribute_id', 'id', 'value_upper')
-
-    for attr_map in attr_maps:
-        unmapped_feed_attribute_values = [
-            (value_id, value_upper)
-            for attr_id, value_id, value_upper in unmapped_feed_values
-            if attr_id == attr_map.feed_attribute_id  # type: ignore
-        ]
-        if unmapped_feed_attribute_values:
-            unmapped_values_dict[attr_map.id] = {  # type: ignore
-                'unmapped_feed_values': unmapped_feed_attribute_values,
-            }
-
-    marketplace_values = MarketAttributeValue.objects.filter(
-        dictionary_id__in=mp_attributes_dict_ids.values(),
-        deleted=False,
-    ).annotate(
-        value_upper=Upper('value'),
-    ).values_list('dictionary_id', 'id', 'value_upper')
-
-    for attribute_map_id in unmapped_values_dict:
-
-        mp_attribute_values = [
-            (value_id, value_upper)
-            for dictionary_id, value_id, value_upper in marketplace_values
-            if dictionary_id == mp_attributes_dict_ids[attribute_map_id]
-        ]
-        if not mp_attribute_values:
-            continue
-        unmapped_values_dict[attribute_map_id]['mp_values'] = (
-            mp_attribute_values
-        )
-
-    return unmapped_values_dict
+    return list(unique.values())
 
 
 def map_attribute_equal_values_v2(feed_id: int):
-    """Get equal value mappings."""
-    values_for_map = get_both_values_for_unmapped(feed_id)
-    equal_values = get_equal_values(values_for_map)
-    create_val_mappings(equal_values)
+    """Map equal feed and marketplace values of all feed attribute maps.
+
+    Values are matched and inserted by a single INSERT ... SELECT, so no
+    values are fetched from MySQL, dictionary values are looked up by
+    indexed `value_upper` prefix column. Only marketplace attributes with
+    dictionary and `map_equal_values` are mapped, feed values already
+    mapped by such attribute maps are skipped. If marketplace dictionary
+    has several equal values, the first one is used.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            INSERT IGNORE INTO mapper_valuemap (
+                attribute_map_id,
+                feed_attribute_value_id,
+                marketplace_attribute_value_id
+            )
+            SELECT
+                attribute_map.id,
+                feed_value.id,
+                MIN(market_value.id)
+            FROM mapper_attributemap attribute_map
+            JOIN mapper_feedcategoryattribute feed_attribute
+                ON attribute_map.feed_attribute_id = feed_attribute.id
+            JOIN mapper_feedcategory feed_category
+                ON feed_attribute.category_id = feed_category.id
+            JOIN mapper_marketcategoryattribute category_attribute
+                ON attribute_map.marketplace_attribute_id
+                    = category_attribute.id
+            JOIN mapper_marketattribute market_attribute
+                ON category_attribute.attribute_id = market_attribute.id
+            JOIN mapper_feedcategoryattributevalue feed_value
+                ON feed_value.attribute_id = feed_attribute.id
+            JOIN mapper_marketattributevalue market_value
+                ON market_value.dictionary_id = market_attribute.dictionary_id
+                AND market_value.deleted = FALSE
+                AND market_value.value_upper
+                    = UPPER(LEFT(feed_value.value, 191))
+                AND UPPER(market_value.value) = BINARY UPPER(feed_value.value)
+            WHERE feed_category.feed_id = %s
+                AND market_attribute.map_equal_values = TRUE
+                AND market_attribute.dictionary_id IS NOT NULL
+                AND NOT EXISTS (
+                    SELECT 1
+                    FROM mapper_valuemap value_map
+                    JOIN mapper_attributemap mapped_attribute_map
+                        ON value_map.attribute_map_id = mapped_attribute_map.id
+                    JOIN mapper_marketcategoryattribute mapped_category_attr
+                        ON mapped_attribute_map.marketplace_attribute_id
+                            = mapped_category_attr.id
+                    JOIN mapper_marketattribute mapped_attribute
+                        ON mapped_category_attr.attribute_id
+                            = mapped_attribute.id
+                    WHERE value_map.feed_attribute_value_id = feed_value.id
+                        AND mapped_attribute.map_equal_values = TRUE
+                        AND mapped_attribute.dictionary_id IS NOT NULL
+                )
+            GROUP BY attribute_map.id, feed_value.id
+        """, [feed_id])
 
 
 def map_attribute_equal_values(attribute_map_id: int):
@@ -326,8 +243,11 @@ def map_attribute_equal_values(attribute_map_id: int):
     ]):
         return
 
+    # NOTE: lazy queryset, excluded as NOT IN subquery of the values query,
+    # NULL ids would make NOT IN exclude all values
     mapped_feed_values_ids = ValueMap.objects.filter(
         attribute_map_id=attribute_map_id,
+        feed_attribute_value__isnull=False,
     ).values_list('feed_attribute_value', flat=True)
 
     unmapped_feed_values = dict(
@@ -337,7 +257,9 @@ def map_attribute_equal_values(attribute_map_id: int):
             id__in=mapped_feed_values_ids,
         ).annotate(
             value_upper=Upper('value'),
-        ).values_list('value_upper', 'id'),
+        ).values_list('value_upper', 'id').iterator(
+            chunk_size=VALUES_CHUNK_SIZE,
+        ),
     )
 
     marketplace_values = dict(
@@ -346,7 +268,9 @@ def map_attribute_equal_values(attribute_map_id: int):
             deleted=False,
         ).annotate(
             value_upper=Upper('value'),
-        ).values_list('value_upper', 'id'),
+        ).values_list('value_upper', 'id').iterator(
+            chunk_size=VALUES_CHUNK_SIZE,
+        ),
     )
 
     for feed_value_value, feed_value_id in unmapped_feed_values.items():
@@ -362,9 +286,9 @@ def map_attribute_equal_values(attribute_map_id: int):
         )
 
 
-def pre_create_rich_attribute(category_map_id: int):
-    """Pre create rich content attribute."""
-    category_map = CategoryMap.objects.get(id=category_map_id)
+@lru_cache(maxsize=1)
+def get_rich_attribute_id() -> int:
+    """Get or create rich content attribute, id is cached for process."""
     market_attribute, _created = MarketAttribute.objects.get_or_create(
         name='Rich-контент JSON',
         source_id='11254',
@@ -373,47 +297,133 @@ def pre_create_rich_attribute(category_map_id: int):
             'data_type': 'String',
         },
     )
-    MarketCategoryAttribute.objects.get_or_create(
-        category_id=category_map.marketplace_category_id,
-        attribute_id=market_attribute.id,
-    )
+    return market_attribute.id
 
 
-def map_attributes_by_name(category_map_id: int):
-    """Map attributes by name."""
-    category_map = CategoryMap.objects.get(id=category_map_id)
-    pre_create_rich_attribute(category_map_id)
+def pre_create_rich_attribute(marketplace_category_id: int):
+    """Pre create rich content attribute of marketplace category."""
+    try:
+        MarketCategoryAttribute.objects.get_or_create(
+            category_id=marketplace_category_id,
+            attribute_id=get_rich_attribute_id(),
+        )
+    except IntegrityError:
+        # NOTE: cached attribute was deleted, e.g. by garbage collector
+        get_rich_attribute_id.cache_clear()
+        MarketCategoryAttribute.objects.get_or_create(
+            category_id=marketplace_category_id,
+            attribute_id=get_rich_attribute_id(),
+        )
 
-    mapped_marketplace_attribute_ids = AttributeMap.objects.filter(
-        category_map_id=category_map_id,
-    ).values_list('marketplace_attribute__id', flat=True)
 
-    attributes_need_to_map = dict(
-        MarketCategoryAttribute.objects.filter(
-            category_id=category_map.marketplace_category_id,
-        ).exclude(
-            id__in=mapped_marketplace_attribute_ids,
-        ).exclude(
-            attribute__map_feed_attribute_name__isnull=True,
-        ).exclude(
-            attribute__map_feed_attribute_name__exact='',
-        ).values_list('attribute__map_feed_attribute_name', 'id'),
+def map_attributes_by_name(category_map_ids: Iterable[int]):
+    """Map attributes of category maps by name.
+
+    Attributes of all category maps are read and mapped together,
+    with a fixed number of queries besides equal values mapping.
+    """
+    category_maps = list(CategoryMap.objects.filter(
+        id__in=category_map_ids,
+    ).values_list('id', 'feed_category_id', 'marketplace_category_id'))
+    if not category_maps:
+        return
+
+    category_map_ids = [category_map[0] for category_map in category_maps]
+    marketplace_category_ids = {
+        marketplace_category_id
+        for _, _, marketplace_category_id in category_maps
+    }
+    for marketplace_category_id in marketplace_category_ids:
+        pre_create_rich_attribute(marketplace_category_id)
+
+    mapped_attributes = {
+        (category_map_id, marketplace_attribute_id): attribute_map_id
+        for attribute_map_id, category_map_id, marketplace_attribute_id
+        in AttributeMap.objects.filter(
+            category_map_id__in=category_map_ids,
+        ).values_list('id', 'category_map_id', 'marketplace_attribute_id')
+    }
+
+    marketplace_attributes = MarketCategoryAttribute.objects.filter(
+        category_id__in=marketplace_category_ids,
+    ).exclude(
+        attribute__map_feed_attribute_name__isnull=True,
+    ).exclude(
+        attribute__map_feed_attribute_name__exact='',
+    ).annotate(
+        name_upper=Upper('attribute__map_feed_attribute_name'),
+    ).values_list(
+        'category_id',
+        'attribute__map_feed_attribute_name',
+        'name_upper',
+        'id',
     )
 
-    if not attributes_need_to_map:
+    marketplace_attributes_by_category = defaultdict(list)
+    for category_id, name, name_upper, market_category_attribute_id \
+            in marketplace_attributes:
+        marketplace_attributes_by_category[category_id].append(
+            (name, name_upper, market_category_attribute_id),
+        )
+
+    attributes_need_to_map = {}
+    for category_map_id, feed_category_id, marketplace_category_id \
+            in category_maps:
+        attributes_need_to_map[category_map_id, feed_category_id] = {
+            name: (name_upper, market_category_attribute_id)
+            for name, name_upper, market_category_attribute_id
+            in marketplace_attributes_by_category[marketplace_category_id]
+            if (category_map_id, market_category_attribute_id)
+            not in mapped_attributes
+        }
+
+    names_upper = {
+        name_upper
+        for attributes in attributes_need_to_map.values()
+        for name_upper, _ in attributes.values()
+    }
+    if not names_upper:
         return
 
-    for name, market_category_attribute_id in attributes_need_to_map.items():
-        for feed_attribute_id in FeedCategoryAttribute.objects.filter(
-            category_id=category_map.feed_category_id,
-            name__iexact=name,
-        ).values_list('id', flat=True):
-            attribute_map = AttributeMap.objects.create(
-                category_map_id=category_map_id,
-                feed_attribute_id=feed_attribute_id,
-                marketplace_attribute_id=market_category_attribute_id,
-            )
-            map_attribute_equal_values(attribute_map.id)
+    feed_attributes = FeedCategoryAttribute.objects.filter(
+        category_id__in={
+            feed_category_id for _, feed_category_id, _ in category_maps
+        },
+    ).annotate(
+        name_upper=Upper('name'),
+    ).filter(
+        name_upper__in=names_upper,
+    ).values_list('category_id', 'name_upper', 'id')
+
+    feed_attribute_ids_by_name = defaultdict(list)
+    for category_id, name_upper, feed_attribute_id in feed_attributes:
+        feed_attribute_ids_by_name[category_id, name_upper].append(
+            feed_attribute_id,
+        )
+
+    attribute_maps = [
+        AttributeMap(
+            category_map_id=category_map_id,
+            feed_attribute_id=feed_attribute_id,
+            marketplace_attribute_id=market_category_attribute_id,
+        )
+        for (category_map_id, feed_category_id), attributes
+        in attributes_need_to_map.items()
+        for name_upper, market_category_attribute_id in attributes.values()
+        for feed_attribute_id
+        in feed_attribute_ids_by_name[feed_category_id, name_upper]
+    ]
+    if not attribute_maps:
+        return
+
+    AttributeMap.objects.bulk_create(attribute_maps)
+
+    for attribute_map_id in AttributeMap.objects.filter(
+        category_map_id__in=category_map_ids,
+    ).exclude(
+        id__in=mapped_attributes.values(),
+    ).values_list('id', flat=True):
+        map_attribute_equal_values(attribute_map_id)
 
 
 def get_category_map(
@@ -437,25 +447,32 @@ def get_category_map(
     :return: category_map
     :rtype: Dict[str, str]
     """
-    category_map_queryset = CategoryMap.objects.select_related(
-        'feed_category',
-        'marketplace_category',
-    ).filter(
+    category_map_queryset = CategoryMap.objects.filter(
         feed_category__feed__domain=feed_domain,
         marketplace_category__marketplace__marketplace=marketplace,
+    ).values_list(
+        'feed_category__source_id',
+        'marketplace_category__source_id',
+        'pk',
+        'marketplace_category__deleted',
     )
 
     category_map = {
-        cat_map.feed_category.source_id:
+        feed_category_source_id:
             {
                 'market_category_id':
-                    str(cat_map.marketplace_category.source_id),
+                    str(market_category_source_id),
                 'mapping_id':
-                    cat_map.pk,
+                    mapping_id,
                 'market_category_deleted':
-                    cat_map.marketplace_category.deleted,
+                    market_category_deleted,
             }
-        for cat_map in category_map_queryset
+        for (
+            feed_category_source_id,
+            market_category_source_id,
+            mapping_id,
+            market_category_deleted,
+        ) in category_map_queryset
     }
 
     return category_map
@@ -501,6 +518,14 @@ def get_category_attribute_map(
     attribute_map_queryset = AttributeMap.objects.select_related(
         'feed_attribute',
         'marketplace_attribute__attribute',
+    ).prefetch_related(
+        Prefetch(
+            'valuemap_set',
+            queryset=ValueMap.objects.select_related(
+                'feed_attribute_value',
+                'marketplace_attribute_value',
+            ),
+        ),
     ).filter(
         category_map__pk=category_mapping_id,
         marketplace_attribute__attribute__disabled=False,
@@ -529,34 +554,20 @@ def get_category_attribute_map(
             },
         )
 
-        if map_data['dictionary_id']:
-            map_data['values_map'] = {}
-
-    value_map_queryset = ValueMap.objects.select_related(
-        'attribute_map',
-        'feed_attribute_value',
-        'marketplace_attribute_value',
-        'feed_attribute_value__attribute',
-    ).filter(
-        attribute_map__category_map__pk=category_mapping_id,
-        attribute_map__marketplace_attribute__attribute__disabled=False,
-    )
-
-    for val_map in value_map_queryset:
-        market_value = val_map.marketplace_attribute_value
-        feed_value = val_map.feed_attribute_value
-        feed_attribute_name = normalize_string(feed_value.attribute.name)
-        attr_values = attribute_map_data[
-            feed_attribute_name
-        ][val_map.attribute_map_id].get('values_map')
-        if attr_values is None:
+        if not map_data['dictionary_id']:
             continue
 
-        attr_values.setdefault(feed_value.value.upper(), []).append({
-            'value': market_value.value,
-            'dictionary_value_id': market_value.source_id or 0,
-            'deleted': market_value.deleted,
-        })
+        attr_values = map_data['values_map'] = {}
+        for val_map in attr_map.valuemap_set.all():
+            market_value = val_map.marketplace_attribute_value
+            attr_values.setdefault(
+                val_map.feed_attribute_value.value.upper(),
+                [],
+            ).append({
+                'value': market_value.value,
+                'dictionary_value_id': market_value.source_id or 0,
+                'deleted': market_value.deleted,
+            })
 
     return attribute_map_data
 
@@ -599,12 +610,18 @@ def get_unit_map():
 def get_mapped_values(
     attribute_map: dict,
     feed_attribute_values,
+    value_unit_map: Optional[Dict[Tuple[int, int], float]] = None,
 ) -> Dict[str, Any]:
-    """Get attributes values for marketplace."""
-    value_unit_map = get_unit_map()
+    """Get attributes values for marketplace.
+
+    Callers mapping many offers pass `value_unit_map` loaded once per run,
+    otherwise it is loaded on every call.
+    """
+    if value_unit_map is None:
+        value_unit_map = get_unit_map()
 
     result: Dict[str, Any] = {
-        'values': {},
+        'values': {attr_name: [] for attr_name in feed_attribute_values},
         'unmapped_attributes': [],
         'unmapped_value_attributes': [],
         'empty_value_attributes': [],
@@ -614,17 +631,24 @@ def get_mapped_values(
     }
 
     for attr_name, attr_values in feed_attribute_values.items():
-        for attr_value in attr_values:
-            upper_value = attr_value.upper()
-            attribute_mapping_data = attribute_map.get(attr_name)
-            if not attribute_mapping_data:
-                result['unmapped_attributes'].append(attr_name)
-                continue
+        attribute_mapping_data = attribute_map.get(attr_name)
+        if not attribute_mapping_data:
+            # NOTE: attribute is reported for each of its values
+            result['unmapped_attributes'].extend(
+                attr_name for _attr_value in attr_values
+            )
+            continue
 
-            for mapping_for_market in attribute_mapping_data.values():
-                if mapping_for_market['deleted']:
-                    continue
+        mappings_for_market = [
+            mapping_for_market
+            for mapping_for_market in attribute_mapping_data.values()
+            if not mapping_for_market['deleted']
+        ]
+        mapped_values = result['values'][attr_name]
 
+        for attr_value in attr_values:
+            upper_value = attr_value.upper()
+            for mapping_for_market in mappings_for_market:
                 attribute_source_id = mapping_for_market['source_id']
 
                 if attr_value == '':
@@ -644,10 +668,7 @@ def get_mapped_values(
                     for values_map in values_maps[upper_value]:
                         if values_map['deleted']:
                             continue
-                        result['values'].setdefault(
-                            attr_name,
-                            [],
-                        ).append(
+                        mapped_values.append(
                             dict(
                                 **values_map,
                                 attribute_source_id=attribute_source_id,
@@ -661,7 +682,7 @@ def get_mapped_values(
                             ),
                         )
 
-                    if attr_name not in result['values']:
+                    if not mapped_values:
                         result['mapped_with_deleted_value'].append(
                             attribute_source_id,
                         )
@@ -684,10 +705,7 @@ def get_mapped_values(
                             )
                             continue
 
-                    result['values'].setdefault(
-                        attr_name,
-                        [],
-                    ).append({
+                    mapped_values.append({
                         'value': value,
                         'dictionary_value_id': 0,
                         'attribute_source_id': attribute_source_id,
@@ -735,82 +753,183 @@ def set_mapping_sync_error(
     )
 
 
+def _set_copy_ids(copies: List[Model], queryset: QuerySet):
+    """Set ids of bulk created copies on backends not returning them.
+
+    Queryset must select the copies only. Auto increment ids grow in
+    insertion order, so copies get ids of queryset ordered by id.
+    """
+    copy_ids = list(queryset.order_by('id').values_list('id', flat=True))
+    if len(copy_ids) != len(copies):
+        raise ValueError(
+            f'Expected {len(copies)} copies of {queryset.model.__name__}, '
+            f'found {len(copy_ids)}',
+        )
+
+    for copied, copy_id in zip(copies, copy_ids):
+        copied.id = copy_id
+
+
+@transaction.atomic
 def copy_mapping(
     from_feed_id: int,
     to_feed_id: int,
 ):
     """Copy mappings from feed to other one.
 
+    Copies are created level by level with bulk_create: categories,
+    category maps, attributes, attribute maps and values. Value maps are
+    read and inserted as plain rows. Attributes are copied per category
+    map and values per attribute map.
+
     :param int from_feed_id: From feed id
-    :param int to_feed_id: New feed id
+    :param int to_feed_id: New feed id, without categories
     """
-    new_category_ids = {}
-
-    def get_new_category_id(old_category: FeedCategory):
-        if old_category.id not in new_category_ids:
-            old_category.feed_id = to_feed_id
-            old_category_id = old_category.id
-            old_category.id = None
-            old_category.save()
-            new_category_ids[old_category_id] = old_category.id
-            return old_category.id
-        return new_category_ids[old_category.id]
-
-    for category_map in CategoryMap.objects.filter(
+    category_maps = list(CategoryMap.objects.select_related(
+        'feed_category',
+    ).filter(
         feed_category__feed_id=from_feed_id,
-    ):
-        from_category_map_id = category_map.id
+    ).order_by('id'))
+    attribute_maps = list(AttributeMap.objects.select_related(
+        'feed_attribute',
+    ).filter(
+        category_map__feed_category__feed_id=from_feed_id,
+    ).order_by('id'))
+    value_maps = list(ValueMap.objects.filter(
+        attribute_map__category_map__feed_category__feed_id=from_feed_id,
+    ).order_by('id').values_list(
+        'attribute_map_id',
+        'feed_attribute_value_id',
+        'marketplace_attribute_value_id',
+    ))
+
+    new_categories: Dict[int, FeedCategory] = {}
+    for category_map in category_maps:
+        category = category_map.feed_category
+        if category.id not in new_categories:
+            new_categories[category.id] = category
+            category.feed_id = to_feed_id
+
+    for category in new_categories.values():
+        category.id = None
+    FeedCategory.objects.bulk_create(
+        new_categories.values(),
+        batch_size=COPY_MAPPING_BATCH_SIZE,
+    )
+    _set_copy_ids(
+        list(new_categories.values()),
+        FeedCategory.objects.filter(feed_id=to_feed_id),
+    )
 
-        category_map.feed_category_id = get_new_category_id(
-            category_map.feed_category,
-        )
+    new_category_maps: Dict[int, CategoryMap] = {}
+    for category_map in category_maps:
+        new_category_maps[category_map.id] = category_map
+        category_map.feed_category_id = new_categories[
+            category_map.feed_category_id
+        ].id
         category_map.id = None
-        category_map.save()
-
-        new_feed_attributes = {}
-        for attribute_map in AttributeMap.objects.filter(
-            category_map_id=from_category_map_id,
-        ):
-            from_attribute_map_id = attribute_map.id
-
-            if attribute_map.feed_attribute_id not in new_feed_attributes:
-                attribute = attribute_map.feed_attribute
-                from_attribute_id = attribute.id
-                attribute.category_id = category_map.feed_category_id
-                attribute.id = None
-                attribute.save()
-                new_feed_attributes[from_attribute_id] = attribute.id
-
-            new_attribute_id = new_feed_attributes[
-                attribute_map.feed_attribute_id
-            ]
-            attribute_map.feed_attribute_id = new_attribute_id
-            attribute_map.category_map = category_map
-            attribute_map.id = None
-            attribute_map.save()
-
-            new_feed_values = {}
-            for value_map in ValueMap.objects.filter(
-                attribute_map_id=from_attribute_map_id,
-            ):
-                if value_map.feed_attribute_value_id not in new_feed_values:
-                    value = value_map.feed_attribute_value
-                    from_value_id = value.id
-                    value.attribute_id = new_attribute_id
-                    value.id = None
-                    value.save()
-                    new_feed_values[from_value_id] = value.id
-
-                new_value_id = new_feed_values[
-                    value_map.feed_attribute_value_id
-                ]
-
-                value_map.feed_attribute_value_id = new_value_id
-                value_map.attribute_map = attribute_map
-                value_map.id = None
-                value_map.save()
+    CategoryMap.objects.bulk_create(
+        category_maps,
+        batch_size=COPY_MAPPING_BATCH_SIZE,
+    )
+    _set_copy_ids(
+        category_maps,
+        CategoryMap.objects.filter(feed_category__feed_id=to_feed_id),
+    )
+
+    new_attributes: Dict[Tuple[int, int], FeedCategoryAttribute] = {}
+    for attribute_map in attribute_maps:
+        attribute_key = (
+            attribute_map.category_map_id,
+            attribute_map.feed_attribute_id,
+        )
+        if attribute_key not in new_attributes:
+            attribute = attribute_map.feed_attribute
+            attribute.category_id = new_category_maps[
+                attribute_map.category_map_id
+            ].feed_category_id
+            attribute.id = None
+            new_attributes[attribute_key] = attribute
+    FeedCategoryAttribute.objects.bulk_create(
+        new_attributes.values(),
+        batch_size=COPY_MAPPING_BATCH_SIZE,
+    )
+    _set_copy_ids(
+        list(new_attributes.values()),
+        FeedCategoryAttribute.objects.filter(category__feed_id=to_feed_id),
+    )
+
+    new_attribute_maps: Dict[int, AttributeMap] = {}
+    for attribute_map in attribute_maps:
+        new_attribute_maps[attribute_map.id] = attribute_map
+        attribute_map.feed_attribute_id = new_attributes[(
+            attribute_map.category_map_id,
+            attribute_map.feed_attribute_id,
+        )].id
+        attribute_map.category_map_id = new_category_maps[
+            attribute_map.category_map_id
+        ].id
+        attribute_map.id = None
+    AttributeMap.objects.bulk_create(
+        attribute_maps,
+        batch_size=COPY_MAPPING_BATCH_SIZE,
+    )
+    _set_copy_ids(
+        attribute_maps,
+        AttributeMap.objects.filter(
+            category_map__feed_category__feed_id=to_feed_id,
+        ),
+    )
+
+    feed_values = FeedCategoryAttributeValue.objects.in_bulk({
+        feed_value_id for _, feed_value_id, _ in value_maps
+    })
+    new_values: Dict[Tuple[int, int], FeedCategoryAttributeValue] = {}
+    for attribute_map_id, feed_value_id, _ in value_maps:
+        value_key = (attribute_map_id, feed_value_id)
+        if value_key not in new_values:
+            value = copy(feed_values[feed_value_id])
+            value.attribute_id = new_attribute_maps[
+                attribute_map_id
+            ].feed_attribute_id
+            value.id = None
+            new_values[value_key] = value
+    FeedCategoryAttributeValue.objects.bulk_create(
+        new_values.values(),
+        batch_size=COPY_MAPPING_BATCH_SIZE,
+    )
+    _set_copy_ids(
+        list(new_values.values()),
+        FeedCategoryAttributeValue.objects.filter(
+            attribute__category__feed_id=to_feed_id,
+        ),
+    )
+
+    # NOTE: value maps are plain rows, so they are inserted without models
+    new_value_maps = [
+        (
+            new_attribute_maps[attribute_map_id].id,
+            new_values[(attribute_map_id, feed_value_id)].id,
+            marketplace_value_id,
+        )
+        for attribute_map_id, feed_value_id, marketplace_value_id
+        in value_maps
+    ]
+    with connection.cursor() as cursor:
+        for i in range(0, len(new_value_maps), COPY_MAPPING_BATCH_SIZE):
+            cursor.executemany(
+                """
+                INSERT INTO mapper_valuemap (
+                    attribute_map_id,
+                    feed_attribute_value_id,
+                    marketplace_attribute_value_id
+                ) VALUES (%s, %s, %s)
+                """,
+                new_value_maps[i:i + COPY_MAPPING_BATCH_SIZE],
+            )
 
 
+@lru_cache(maxsize=NORMALIZED_STRINGS_CACHE_SIZE)
 def normalize_string(string):
     """Normalize string for param names."""
     return string.strip().upper().replace('\u00A0', ' ')
@@ -1,8 +1,10 @@
 """Views for mapper."""
-import re
+from typing import Set
 
 from django.db import transaction
 from django.db.models.functions import Length
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import conditional_page
 
 from apps.mapper.models import (
     AttributeMap,
@@ -44,19 +46,23 @@ from apps.mapper.serializers.serializers import (
     MarketAttributeValueSerializer,
     MarketCategoryAttributeSerializer,
     MarketCategorySerializer,
+    MapperReportEmailSerializer,
     MarketplaceSerializer,
     ValueMapSerializer,
 )
-from apps.mapper.utils.optimized_queries import get_feed_category_tree_data
+from apps.mapper.utils.optimized_queries import (
+    get_feed_category_descendant_ids,
+    get_feed_category_tree_data,
+    get_market_category_tree_data,
+)
 
 from apps.mapper.utils.utils import (
-    make_marketplace_category_tree,
     map_attribute_equal_values,
     map_attributes_by_name,
     copy_mapping,
 )
 from rest_framework import status
-from rest_framework.exceptions import NotFound
+from rest_framework.exceptions import NotFound, ParseError
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.request import Request
@@ -70,6 +76,36 @@ OZON = 'ozon'
 WILDBERRIES = 'wildberries'
 
 
+def get_query_ids(request: Request) -> Set[int]:
+    """Get ids from comma separated `ids` query param.
+
+    Empty items, e.g. of trailing comma, are skipped.
+
+    :raises ParseError: if any id is not an integer
+    """
+    try:
+        return {
+            int(object_id)
+            for object_id in request.query_params.get('ids', '').split(',')
+            if object_id
+        }
+    except ValueError:
+        raise ParseError(detail='Invalid ids')
+
+
+class EagerLoadingMixin:
+    """Apply serializer eager loading to the view queryset.
+
+    Serializer class should provide `setup_eager_loading` classmethod,
+    see :class:`CachedFieldsModelSerializer`.
+    """
+
+    def filter_queryset(self, queryset):
+        """Join or prefetch relations rendered by serializer."""
+        queryset = super().filter_queryset(queryset)
+        return self.get_serializer_class().setup_eager_loading(queryset)
+
+
 class MarketplaceCategoryAttributesAndValues(APIView):
     """API for update category attributes and their values."""
 
@@ -77,34 +113,45 @@ class MarketplaceCategoryAttributesAndValues(APIView):
 
     def put(self, request: Request, category_id: int):
         """Update category data."""
-        try:
-            category = MarketCategory.objects.get(id=category_id)
-
-            if not category.source_id:
-                raise Exception('No source id in category')
-
-            if f'{category.marketplace}' == OZON:
-                update_ozon_category(category.source_id)
-                return Response(status=status.HTTP_200_OK)
+        category = MarketCategory.objects.filter(
+            id=category_id,
+        ).values(
+            'source_id',
+            'marketplace__marketplace',
+        ).first()
+
+        if category is None:
+            return Response(
+                {'error': f'category {category_id} not found'},
+                status=status.HTTP_404_NOT_FOUND,
+            )
 
+        if not category['source_id']:
             return Response(
-                {'error': f'marketplace {category.marketplace} not allowed'},
-                status=status.HTTP_403_FORBIDDEN,
+                {'error': 'No source id in category'},
+                status=status.HTTP_400_BAD_REQUEST,
             )
 
-        except MarketCategory.DoesNotExist:
+        marketplace = category['marketplace__marketplace']
+        if marketplace != OZON:
             return Response(
-                {'error': f'category {category_id} not found'},
-                status=status.HTTP_404_NOT_FOUND,
+                {'error': f'marketplace {marketplace} not allowed'},
+                status=status.HTTP_403_FORBIDDEN,
             )
+
+        # NOTE: only marketplace API errors are reported as update errors
+        try:
+            update_ozon_category(category['source_id'])
         except Exception as err:
             return Response(
                 {'error': f'Err updating category data {err}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+        return Response(status=status.HTTP_200_OK)
 
-class CategoryMapViewSet(ModelViewSet):
+
+class CategoryMapViewSet(EagerLoadingMixin, ModelViewSet):
     """API for category mapping."""
 
     permission_classes = (IsAuthenticated, IsStaffOrAdmin)
@@ -112,6 +159,7 @@ class CategoryMapViewSet(ModelViewSet):
     queryset = CategoryMap.objects.all()
     http_method_names = ['get', 'post', 'delete']
 
+    @transaction.atomic
     def create(self, request, *args, **kwargs):
         """Override default create method to create multiple instances."""
         serializer = self.get_serializer(
@@ -132,10 +180,7 @@ class CategoryMapViewSet(ModelViewSet):
             response.data,
         ]
 
-        for instance in map_instances:
-            category_map_id = instance['id']
-
-            map_attributes_by_name(category_map_id)
+        map_attributes_by_name([instance['id'] for instance in map_instances])
 
         return response
 
@@ -145,6 +190,7 @@ class CategoryMapBatchDeleteView(APIView):
 
     permission_classes = (IsAuthenticated, IsStaffOrAdmin)
 
+    @transaction.atomic
     def delete(self, request: Request):
         """Delete batch CategoryMap objects by their ids.
 
@@ -156,26 +202,28 @@ class CategoryMapBatchDeleteView(APIView):
 
         where ids are category mapping ids.
         """
-        query_params = request.query_params
-        category_map_ids = query_params.get('ids', '').split(',')
-
-        for category_map_id in category_map_ids:
-            try:
-                CategoryMap.objects.get(id=category_map_id).delete()
-            except CategoryMap.DoesNotExist:
-                raise NotFound(
-                    detail=f'Category mapping with {category_map_id} id'
-                           f' not found!',
-                )
+        category_map_ids = get_query_ids(request)
+
+        category_maps = CategoryMap.objects.filter(id__in=category_map_ids)
+        missing_ids = category_map_ids.difference(
+            category_maps.values_list('id', flat=True),
+        )
+        if missing_ids:
+            raise NotFound(
+                detail=f'Category mappings with {sorted(missing_ids)} ids'
+                       f' not found!',
+            )
+
+        category_maps.delete()
 
         return Response(
-            data=f'Category mappings with {category_map_ids}'
+            data=f'Category mappings with {sorted(category_map_ids)}'
                  f' ids are successfully deleted!',
             status=status.HTTP_200_OK,
         )
 
 
-class AttributeMapViewSet(ModelViewSet):
+class AttributeMapViewSet(EagerLoadingMixin, ModelViewSet):
     """API for attribute mapping."""
 
     permission_classes = (IsAuthenticated, IsStaffOrAdmin)
@@ -190,11 +238,12 @@ class AttributeMapViewSet(ModelViewSet):
             category_map=category_map,
         )
 
-        if queryset:
-            return queryset
-        else:
+        if not queryset.exists():
             raise NotFound()
 
+        return queryset
+
+    @transaction.atomic
     def create(self, request, *args, **kwargs):
         """Create attribute map."""
         response = super(AttributeMapViewSet, self).create(
@@ -207,7 +256,7 @@ class AttributeMapViewSet(ModelViewSet):
         return response
 
 
-class ValueMapViewSet(ModelViewSet):
+class ValueMapViewSet(EagerLoadingMixin, ModelViewSet):
     """API for value mapping."""
 
     permission_classes = (IsAuthenticated, IsStaffOrAdmin)
@@ -222,11 +271,11 @@ class ValueMapViewSet(ModelViewSet):
             attribute_map=attribute_map,
         )
 
-        if queryset:
-            return queryset
-        else:
+        if not queryset.exists():
             raise NotFound()
 
+        return queryset
+
 
 class FeedCategoryAttributeNameView(APIView):
     """Endpoint for feed parent category attribute names reading."""
@@ -237,26 +286,13 @@ class FeedCategoryAttributeNameView(APIView):
         self, request: Request, category_id: int,
     ) -> Response:
         """Return child categories attribute names."""
-
-        def get_child_attribute_names(category_id):
-            names = set()
-            for attribute in FeedCategoryAttribute.objects.filter(
-                category_id=category_id,
-                deleted=False,
-            ):
-                names.add(attribute.name)
-
-            for category in FeedCategory.objects.filter(
-                parent_id=category_id,
-                deleted=False,
-            ):
-                names.update(get_child_attribute_names(category.id))
-            return names
-
-        attribute_names = get_child_attribute_names(category_id)
+        attribute_names = FeedCategoryAttribute.objects.filter(
+            category_id__in=get_feed_category_descendant_ids(category_id),
+            deleted=False,
+        ).values_list('name', flat=True).distinct().order_by('name')
 
         return Response(
-            data=[{'name': name} for name in sorted(list(attribute_names))],
+            data=[{'name': name} for name in attribute_names],
             status=status.HTTP_200_OK,
         )
 
@@ -270,41 +306,27 @@ class FeedCategoryMarketAttributeNameView(APIView):
         self, request: Request, category_id: int, market_id: int,
     ) -> Response:
         """Return child mapped categories attribute names."""
-
-        def get_child_attribute_names(feed_category_id):
-            names = set()
-
-            market_category_ids = CategoryMap.objects.filter(
-                feed_category_id=feed_category_id,
-                marketplace_category__marketplace__id=market_id,
-                marketplace_category__deleted=False
-            ).values_list('marketplace_category_id', flat=True)
-
-            names.update(
-                MarketCategoryAttribute.objects.filter(
-                    deleted=False,
-                    category_id__in=market_category_ids,
-                ).values_list('attribute__name', flat=True)
-            )
-
-            for category in FeedCategory.objects.filter(
-                parent_id=feed_category_id,
-                deleted=False,
-            ):
-                names.update(get_child_attribute_names(category.id))
-            return names
-
-        attribute_names = get_child_attribute_names(category_id)
+        attribute_names = MarketCategoryAttribute.objects.filter(
+            deleted=False,
+            category__categorymap__feed_category_id__in=(
+                get_feed_category_descendant_ids(category_id)
+            ),
+            category__marketplace_id=market_id,
+            category__deleted=False,
+        ).values_list(
+            'attribute__name',
+            flat=True,
+        ).distinct().order_by('attribute__name')
 
         return Response(
-            data=[{'name': name} for name in sorted(list(attribute_names))],
+            data=[{'name': name} for name in attribute_names],
             status=status.HTTP_200_OK,
         )
 
 
 
 
-class FeedMetaViewSet(ModelViewSet):
+class FeedMetaViewSet(EagerLoadingMixin, ModelViewSet):
     """API for feed manipulations."""
 
     permission_classes = (IsAuthenticated, IsStaffOrAdmin, IsAccountant)
@@ -332,11 +354,11 @@ class FeedCategoryView(ListAPIView):
             feed=feed_id,
         )
 
-        if queryset:
-            return queryset
-        else:
+        if not queryset.exists():
             raise NotFound()
 
+        return queryset
+
     def get(self, request: Request, feed_id: int) -> Response:
         """Return category tree."""
 
@@ -356,7 +378,9 @@ class FeedCategoryByIdView(APIView):
     def get(self, request: Request, category_id: int) -> Response:
         """Get feed category by id."""
         try:
-            category = FeedCategory.objects.get(id=category_id)
+            category = FeedCategorySerializer.setup_eager_loading(
+                FeedCategory.objects.all(),
+            ).get(id=category_id)
             data = FeedCategorySerializer(category).data
 
         except FeedCategory.DoesNotExist:
@@ -386,7 +410,7 @@ class FeedCategoryByIdView(APIView):
         )
 
 
-class FeedCategoryAttributeView(ListAPIView):
+class FeedCategoryAttributeView(EagerLoadingMixin, ListAPIView):
     """Endpoint for reading category attributes."""
 
     permission_classes = (IsAuthenticated, IsStaffOrAdmin)
@@ -400,12 +424,13 @@ class FeedCategoryAttributeView(ListAPIView):
             category=category_id,
         )
 
-        if queryset:
-            return queryset
-        else:
+        if not queryset.exists():
             raise NotFound()
 
+        return queryset
+
 
+@method_decorator(conditional_page, name='dispatch')
 class FeedCategoryAttributeByIdView(APIView):
     """Endpoint for reading category attribute by id."""
 
@@ -414,7 +439,9 @@ class FeedCategoryAttributeByIdView(APIView):
     def get(self, request: Request, attribute_id: int) -> Response:
         """Get feed category attribute by id."""
         try:
-            attribute = FeedCategoryAttribute.objects.get(id=attribute_id)
+            attribute = FeedCategoryAttributeSerializer.setup_eager_loading(
+                FeedCategoryAttribute.objects.all(),
+            ).get(id=attribute_id)
             data = FeedCategoryAttributeSerializer(attribute).data
 
         except FeedCategoryAttribute.DoesNotExist:
@@ -426,7 +453,7 @@ class FeedCategoryAttributeByIdView(APIView):
         return Response(data=data, status=status.HTTP_200_OK)
 
 
-class FeedCategoryAttributeValueView(ListAPIView):
+class FeedCategoryAttributeValueView(EagerLoadingMixin, ListAPIView):
     """Endpoint for reading category attribute values."""
 
     permission_classes = (IsAuthenticated, IsStaffOrAdmin)
@@ -440,12 +467,13 @@ class FeedCategoryAttributeValueView(ListAPIView):
             attribute=attribute_id,
         )
 
-        if queryset:
-            return queryset
-        else:
+        if not queryset.exists():
             raise NotFound()
 
+        return queryset
 
+
+@method_decorator(conditional_page, name='dispatch')
 class FeedCategoryAttributeValueByIdView(APIView):
     """Endpoint for reading category attribute value by id."""
 
@@ -454,7 +482,9 @@ class FeedCategoryAttributeValueByIdView(APIView):
     def get(self, request: Request, value_id: int) -> Response:
         """Get feed category attribute value by id."""
         try:
-            value = FeedCategoryAttributeValue.objects.get(id=value_id)
+            value = FeedCategoryAttributeValueSerializer.setup_eager_loading(
+                FeedCategoryAttributeValue.objects.all(),
+            ).get(id=value_id)
             data = FeedCategoryAttributeValueSerializer(value).data
 
         except FeedCategoryAttributeValue.DoesNotExist:
@@ -466,7 +496,7 @@ class FeedCategoryAttributeValueByIdView(APIView):
         return Response(data=data, status=status.HTTP_200_OK)
 
 
-class MarketplaceViewSet(ModelViewSet):
+class MarketplaceViewSet(EagerLoadingMixin, ModelViewSet):
     """Endpoint for marketplace manipulations."""
 
     permission_classes = (IsAuthenticated, IsStaffOrAdmin)
@@ -489,29 +519,20 @@ class MarketCategoryView(ListAPIView):
             marketplace=marketplace_id,
         )
 
-        if queryset:
-            return queryset
-        else:
+        if not queryset.exists():
             raise NotFound()
 
+        return queryset
+
     def get(self, request: Request, marketplace_id: int) -> Response:
         """Return category tree."""
-        categories = MarketCategory.objects.filter(
-            marketplace=marketplace_id,
-        )
-
-        if categories:
-
-            raw_data = MarketCategorySerializer(categories, many=True).data
-
-            data = make_marketplace_category_tree(raw_data)
-
-            return Response(data=data, status=status.HTTP_200_OK)
-
-        else:
+        data = get_market_category_tree_data(marketplace_id)
 
+        if not data:
             raise NotFound()
 
+        return Response(data=data, status=status.HTTP_200_OK)
+
 
 class MarketCategoryByIdView(APIView):
     """Endpoint for reading market category by id."""
@@ -521,7 +542,9 @@ class MarketCategoryByIdView(APIView):
     def get(self, request: Request, category_id: int) -> Response:
         """Get marketplace category by id."""
         try:
-            category = MarketCategory.objects.get(id=category_id)
+            category = MarketCategorySerializer.setup_eager_loading(
+                MarketCategory.objects.all(),
+            ).get(id=category_id)
             data = MarketCategorySerializer(category).data
 
         except MarketCategory.DoesNotExist:
@@ -533,7 +556,7 @@ class MarketCategoryByIdView(APIView):
         return Response(data=data, status=status.HTTP_200_OK)
 
 
-class MarketCategoryAttributeView(ListAPIView):
+class MarketCategoryAttributeView(EagerLoadingMixin, ListAPIView):
     """Endpoint for reading market category attributes."""
 
     permission_classes = (IsAuthenticated, IsStaffOrAdmin)
@@ -548,12 +571,13 @@ class MarketCategoryAttributeView(ListAPIView):
             attribute__disabled=False,
         )
 
-        if queryset:
-            return queryset
-        else:
+        if not queryset.exists():
             raise NotFound()
 
+        return queryset
 
+
+@method_decorator(conditional_page, name='dispatch')
 class MarketCategoryAttributeByIdView(APIView):
     """Endpoint for reading market category attribute by id."""
 
@@ -562,7 +586,9 @@ class MarketCategoryAttributeByIdView(APIView):
     def get(self, request: Request, attribute_id: int) -> Response:
         """Get market category attribute by id."""
         try:
-            attribute = MarketCategoryAttribute.objects.get(id=attribute_id)
+            attribute = MarketCategoryAttributeSerializer.setup_eager_loading(
+                MarketCategoryAttribute.objects.all(),
+            ).get(id=attribute_id)
             data = MarketCategoryAttributeSerializer(attribute).data
 
         except MarketCategoryAttribute.DoesNotExist:
@@ -574,7 +600,7 @@ class MarketCategoryAttributeByIdView(APIView):
         return Response(data=data, status=status.HTTP_200_OK)
 
 
-class MarketAttributeValueView(ListAPIView):
+class MarketAttributeValueView(EagerLoadingMixin, ListAPIView):
     """Endpoint for reading market category attribute values."""
 
     permission_classes = (IsAuthenticated, IsStaffOrAdmin)
@@ -584,17 +610,19 @@ class MarketAttributeValueView(ListAPIView):
         """DB query set."""
         attribute_id = self.kwargs['attribute_id']
 
-        category_attribute = MarketCategoryAttribute.objects.get(
+        category_attribute = MarketCategoryAttribute.objects.select_related(
+            'attribute',
+        ).get(
             id=attribute_id,
         )
 
         search_string = self.request.query_params.get("search", "")
 
-        if not category_attribute.attribute.dictionary:
+        if not category_attribute.attribute.dictionary_id:
             raise NotFound()
 
         filters = {
-            'dictionary': category_attribute.attribute.dictionary.id,
+            'dictionary': category_attribute.attribute.dictionary_id,
             'deleted': False,
         }
 
@@ -608,12 +636,13 @@ class MarketAttributeValueView(ListAPIView):
             'value',
         )
 
-        if queryset:
-            return queryset[:VALUES_SEARCH_RESULT_LENGTH]
-        else:
+        if not queryset.exists():
             raise NotFound()
 
+        return queryset[:VALUES_SEARCH_RESULT_LENGTH]
+
 
+@method_decorator(conditional_page, name='dispatch')
 class MarketAttributeValueByIdView(APIView):
     """Endpoint for reading market category attribute value by id."""
 
@@ -622,7 +651,9 @@ class MarketAttributeValueByIdView(APIView):
     def get(self, request: Request, value_id: int) -> Response:
         """Get market category attribute value by id."""
         try:
-            value = MarketAttributeValue.objects.get(id=value_id)
+            value = MarketAttributeValueSerializer.setup_eager_loading(
+                MarketAttributeValue.objects.all(),
+            ).get(id=value_id)
             data = MarketAttributeValueSerializer(value).data
 
         except MarketAttributeValue.DoesNotExist:
@@ -634,7 +665,7 @@ class MarketAttributeValueByIdView(APIView):
         return Response(data=data, status=status.HTTP_200_OK)
 
 
-class FeedMarketplaceSettingsViewSet(ModelViewSet):
+class FeedMarketplaceSettingsViewSet(EagerLoadingMixin, ModelViewSet):
     """Endpoint for FeedMarketplaceSettings manipulations."""
 
     permission_classes = IsAuthenticated, IsStaffOrAdmin
@@ -649,11 +680,12 @@ class FeedMarketplaceSettingsViewSet(ModelViewSet):
             feed_id=feed_id,
             marketplace_id=marketplace_id,
         )
-        if queryset:
-            return queryset
-        else:
+        if not queryset.exists():
             raise NotFound()
 
+        return queryset
+
+    @transaction.atomic
     def create(self, request, *args, **kwargs):
         """Override default create method."""
         request_data_list = request.data
@@ -685,6 +717,7 @@ class FeedMarketplaceSettingsBatchDeleteView(APIView):
 
     permission_classes = (IsAuthenticated, IsStaffOrAdmin)
 
+    @transaction.atomic
     def delete(self, request: Request, *args, **kwargs):
         """Delete batch FeedMarketplaceSettings objects by their ids.
 
@@ -696,21 +729,23 @@ class FeedMarketplaceSettingsBatchDeleteView(APIView):
 
         where ids are setting ids.
         """
-        query_params = request.query_params
-        settings_ids = query_params.get('ids', '').split(',')
-
-        for settings_id in settings_ids:
-            try:
-                FeedMarketplaceSettings.objects.get(
-                    id=settings_id,
-                ).delete()
-            except FeedMarketplaceSettings.DoesNotExist:
-                raise NotFound(
-                    detail=f'Settings with {settings_id} id not found!',
-                )
+        settings_ids = get_query_ids(request)
+
+        settings = FeedMarketplaceSettings.objects.filter(
+            id__in=settings_ids,
+        )
+        missing_ids = settings_ids.difference(
+            settings.values_list('id', flat=True),
+        )
+        if missing_ids:
+            raise NotFound(
+                detail=f'Settings with {sorted(missing_ids)} ids not found!',
+            )
+
+        settings.delete()
 
         return Response(
-            data=f'Settings with {settings_ids}'
+            data=f'Settings with {sorted(settings_ids)}'
                  f' ids are successfully deleted!',
             status=status.HTTP_200_OK,
         )
@@ -738,28 +773,18 @@ class FeedMappingReportView(APIView):
         self, request: Request, marketplace_id: int, feed_id: int,
     ) -> Response:
         """Generate mapper report in a subprocess and send it to email."""
-        try:
-            emails = getattr(request.data, 'get', {}.get)('email')
-            if not emails or type(emails) is not str:
-                raise Exception('No emails provided')
-
-            valid_emails = [
-                email for email in emails.split(' ')
-                if is_email_valid(email)
-            ]
-            if not valid_emails:
-                raise Exception(
-                    f'All provided emails are invalid. {emails.split(" ")}',
-                )
-
-        except Exception as err:
+        serializer = MapperReportEmailSerializer(data=request.data)
+        if not serializer.is_valid():
+            errors = next(iter(serializer.errors.values()))
             return Response(
                 data={
-                    'message': f'Error: {err}',
+                    'message': f'Error: {errors[0]}',
                 },
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        valid_emails = serializer.validated_data['email']
+
         try:
             run_mapper_report_maker_detached(feed_id, valid_emails)
             return Response(
@@ -778,14 +803,6 @@ class FeedMappingReportView(APIView):
             )
 
 
-def is_email_valid(email: str) -> bool:
-    """Check if email str is valid."""
-    regex = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    if (re.fullmatch(regex, email)):
-        return True
-    return False
-
-
 class FeedMappingsCopyView(APIView):
     """Endpoint for feed mappings copy."""
 
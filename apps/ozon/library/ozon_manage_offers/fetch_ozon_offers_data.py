@@ -4,6 +4,7 @@ import logging
 from typing import Any, Dict, List, Optional, Set, Union, Tuple
 from pymongo.collection import Collection
 
+from django.db import transaction
 from django.utils import timezone
 from django.utils.functional import cached_property
 
@@ -35,6 +36,7 @@ FAILED_STATES = [
 ]
 
 OZON = 'ozon'
+OZON_OFFERS_BATCH_SIZE = 500
 
 
 class FetchOzonOfferData(MongoConnMixin):
@@ -78,7 +80,7 @@ class FetchOzonOfferData(MongoConnMixin):
         self.last_stocks: Collection = getattr(self.db, f'{self.domain}.last_stocks')               # noqa: E501
         self.last_stocks_info: Collection = getattr(self.db, f'{self.domain}.last_stocks_info')     # noqa: E501
         self.custom_mapping_domain: str = getattr(
-            OzonAuthKey.objects.get(domain=self.domain).mapping_from_domain,
+            self.ozon_auth.mapping_from_domain,
             'domain',
             self.domain,
         )
@@ -86,12 +88,13 @@ class FetchOzonOfferData(MongoConnMixin):
         self.category_map = self._get_domain_category_map(self.custom_mapping_domain)
         self.feed_categories_ids = self.get_feed_categories_ids()
         self.feed_categories_names = self.get_feed_categories_names()
-        self.fetched_ozon_products_ids = self.get_ozon_products_ids()
-        self.unprocessed_tasks_ids = self.get_unprocessed_task_ids()
-        self.unprocessed_offers_ids = self.get_unprocessed_offers_ids()
-        self.processed_offers_ids = self.get_processed_offers_ids()
-        self.failed_import_offer_ids = self.get_failed_import_offer_ids()
-        self.imported_offers_errors = self.get_imported_offers_errors()
+        offers_ids = self.get_ozon_offers_ids_data()
+        self.fetched_ozon_products_ids = offers_ids['products_ids']
+        self.unprocessed_tasks_ids = offers_ids['unprocessed_tasks_ids']
+        self.unprocessed_offers_ids = offers_ids['unprocessed_offers_ids']
+        self.processed_offers_ids = offers_ids['processed_offers_ids']
+        self.failed_import_offer_ids = offers_ids['failed_import_offer_ids']
+        self.imported_offers_errors = offers_ids['imported_offers_errors']
         self.domain_settings = self.get_domain_settings()
         self.feed_params = self.get_feed_params()
 
@@ -142,6 +145,13 @@ class FetchOzonOfferData(MongoConnMixin):
 
         return len(fetched_offer_categories)
 
+    @cached_property
+    def ozon_auth(self) -> OzonAuthKey:
+        """Ozon auth key of domain, fetched once per instance."""
+        return OzonAuthKey.objects.select_related(
+            'mapping_from_domain',
+        ).get(domain=self.domain)
+
     @cached_property
     def ozon_category_info(self) -> Dict[str, Dict[str, int]]:
         """Fetch all ozon offers description_category_id and type_id.
@@ -196,13 +206,7 @@ class FetchOzonOfferData(MongoConnMixin):
         :return: feed_categories_ids
         :rtype: List[str]
         """
-        fetched_feed_categories_ids = list(
-            self.feed_categories.find({}, {'_id': 0, '@id': 1}),
-        )
-
-        feed_categories_ids = [
-            category['@id'] for category in fetched_feed_categories_ids
-        ]
+        feed_categories_ids = self.feed_categories.distinct('@id')
 
         return feed_categories_ids
 
@@ -246,282 +250,128 @@ class FetchOzonOfferData(MongoConnMixin):
 
         return feed_offers
 
-    def get_ozon_products_ids(self) -> Dict[str, int]:
-        """Fetch posted Ozon offers from MySQL.
-
-        :return: Ozon products ids
-        :rtype: Dict[str, int]
-        """
-        ozon_offers = OzonOffer.objects.filter(
-            domain=self.domain,
-            is_imported=True,
-        ).exclude(product_id=None)
-
-        if ozon_offers:
-            return {
-                offer.feed_offer_id: offer.product_id
-                for offer in ozon_offers
-            }
-        else:
-            return {}
+    def get_ozon_offers_ids_data(self) -> Dict[str, Any]:
+        """Fetch Ozon offers ID`s grouped by import state from MySQL.
 
+        All groups are collected from one scan of domain offers:
 
-    def get_unprocessed_offers_ids(self) -> List[str]:
-        """Fetch imported unprocessed offers ID's.
-
-        :return unprocessed_offers_ids: Imported but not processed offer's ID's
-        :rtype: List[str]
-        """
-        unprocessed_offers = OzonOffer.objects.all().filter(
-            domain=self.domain,
-            is_processed=False,
-            is_imported=True,
-        )
-
-        unprocessed_offers_ids = [
-            offer.feed_offer_id
-            for offer in unprocessed_offers
-        ]
-
-        return unprocessed_offers_ids
-
-    def get_processed_offers_ids(self) -> List[str]:
-        """Fetch imported and processed offers ID's.
-
-        :return processed_offers_ids: Imported and processed offers
-        :rtype: List[str]
-        """
-        processed_offers = OzonOffer.objects.all().filter(
-            domain=self.domain,
-            is_processed=True,
-            is_imported=True,
-        )
-
-        processed_offers_ids = [
-            offer.feed_offer_id
-            for offer in processed_offers
-        ]
+            products_ids: Posted offers Ozon product ID`s by feed offer ID
+            unprocessed_tasks_ids: Unprocessed offers import task ID`s
+            unprocessed_offers_ids: Imported but not processed offer ID`s
+            processed_offers_ids: Imported and processed offer ID`s
+            failed_import_offer_ids: Failed product import offer ID`s
+            imported_offers_errors: Imported offers validation errors
 
-        return processed_offers_ids
-
-    def get_unprocessed_task_ids(self) -> Set[int]:
-        """Fetch unprocessed offers import task ID`s.
-
-        :return: Unprocessed offers task ID`s
-        :rtype: Set[int]
-        """
-        unprocessed_offers = OzonOffer.objects.all().filter(
-            domain=self.domain,
-            is_imported=False,
-        ).exclude(is_processed=True)
-
-        unprocessed_offers_import_task_ids = {
-            offer.task_id
-            for offer in unprocessed_offers
-        }
-
-        return unprocessed_offers_import_task_ids
-
-    def get_failed_import_offer_ids(self) -> List[str]:
-        """Get offer ID`s for failed product imports."""
-        failed_offers = OzonOffer.objects.all().filter(
-            domain=self.domain,
-            state__in=FAILED_STATES,
-        )
-
-        failed_import_offer_ids = [
-            offer.feed_offer_id
-            for offer in failed_offers
-        ]
-
-        return failed_import_offer_ids
-
-    def get_imported_offers_errors(self) -> List[Dict[str, str]]:
-        """Get imported offers validation errors."""
-        imported_offers = OzonOffer.objects.all().filter(
-            domain=self.domain,
-            is_processed=False,
-            is_imported=True,
-        ).exclude(errors=False)
-
-        imported_offers_error_data = [
-            {
-                'feed_offer_id': offer.feed_offer_id,
-                'errors': offer.errors,
-            }
-            for offer in imported_offers
-        ]
-
-        return imported_offers_error_data
-
-    def set_ozon_offer_state(
-        self,
-        feed_offer_id: str,
-        state: str,
-        is_processed: Optional[bool] = False,
-    ) -> OzonOffer:
-        """Set Ozon offer state.
-
-        :param str feed_offer_id: Feed offer ID
-        :param str state: Current product status in the system
-        :param bool is_processed: True if offer state == processed
-
-        :return result: Operation result
-        :rtype: OzonOffer
+        :return: Offers ID`s data
+        :rtype: Dict[str, Any]
         """
-        domain = OzonAuthKey.objects.get(domain=self.domain)
-
-        update_time_field = 'updated_at'
-
-        offer, created = OzonOffer.objects.update_or_create(
-            domain=domain,
-            feed_offer_id=feed_offer_id,
-            defaults={
-                'state': state,
-                'is_processed': is_processed,
-            },
+        ozon_offers = OzonOffer.objects.filter(domain=self.domain).values(
+            'feed_offer_id',
+            'product_id',
+            'task_id',
+            'state',
+            'errors',
+            'is_imported',
+            'is_processed',
         )
-        setattr(offer, update_time_field, timezone.now())
-        offer.save()
 
-        return offer
+        products_ids: Dict[str, int] = {}
+        unprocessed_tasks_ids: Set[int] = set()
+        unprocessed_offers_ids: List[str] = []
+        processed_offers_ids: List[str] = []
+        failed_import_offer_ids: List[str] = []
+        imported_offers_errors: List[Dict[str, str]] = []
 
-    def set_ozon_error_description(
-        self,
-        feed_offer_id: str,
-        error_description: Dict[str, Any],
-    ) -> OzonOffer:
-        """Set Ozon error description.
+        for offer in ozon_offers.iterator(chunk_size=5000):
+            feed_offer_id = offer['feed_offer_id']
 
-        :param str feed_offer_id: Feed offer ID
-        :param error_description: Fetched Ozon error description
+            if offer['state'] in FAILED_STATES:
+                failed_import_offer_ids.append(feed_offer_id)
 
-        :return result: Operation result
-        :rtype: OzonOffer
-        """
-        domain = OzonAuthKey.objects.get(domain=self.domain)
+            if not offer['is_imported']:
+                if not offer['is_processed']:
+                    unprocessed_tasks_ids.add(offer['task_id'])
+                continue
 
-        update_time_field = 'updated_at'
+            if offer['product_id'] is not None:
+                products_ids[feed_offer_id] = offer['product_id']
 
-        offer, created = OzonOffer.objects.update_or_create(
-            domain=domain,
-            feed_offer_id=feed_offer_id,
-            defaults={
-                'errors': error_description,
-            },
-        )
-        setattr(offer, update_time_field, timezone.now())
-        offer.save()
+            if offer['is_processed']:
+                processed_offers_ids.append(feed_offer_id)
+                continue
 
-        return offer
+            unprocessed_offers_ids.append(feed_offer_id)
 
-    def set_ozon_import_status(
-        self,
-        feed_offer_id: str,
-        is_imported: bool = False,
-        clear_hash: bool = False,
-    ) -> OzonOffer:
-        """Set Ozon import status.
+            # Same as former `.exclude(errors=False)` lookup
+            if offer['errors'] != str(False):
+                imported_offers_errors.append({
+                    'feed_offer_id': feed_offer_id,
+                    'errors': offer['errors'],
+                })
 
-        :param str feed_offer_id: Feed offer ID
-        :param bool is_imported: True if import status == imported
-        :param bool clear_hash: True if need to clear import hash
-
-        :return import_status_info: Operation result
-        :rtype: Dict[str, Any]
-        """
-        domain = OzonAuthKey.objects.get(domain=self.domain)
-
-        field_values: Dict[str, Any] = {
-            'is_imported': is_imported,
+        return {
+            'products_ids': products_ids,
+            'unprocessed_tasks_ids': unprocessed_tasks_ids,
+            'unprocessed_offers_ids': unprocessed_offers_ids,
+            'processed_offers_ids': processed_offers_ids,
+            'failed_import_offer_ids': failed_import_offer_ids,
+            'imported_offers_errors': imported_offers_errors,
         }
-        if clear_hash:
-            field_values['last_import_hash'] = ''
 
-        offer, created = OzonOffer.objects.update_or_create(
-            domain=domain,
-            feed_offer_id=feed_offer_id,
-            defaults=field_values,
-        )
-
-        return offer
-
-    def set_ozon_offer_start_import(
+    def set_ozon_offers_fields(
         self,
-        feed_offer_id: str,
-        task_id: int,
-        import_hash: str,
-    ) -> OzonOffer:
-        """Set Ozon offer import task ID.
+        offers_fields: Dict[str, Dict[str, Any]],
+    ) -> List[OzonOffer]:
+        """Set field values of many Ozon offers, creating missing offers.
 
-        :param str feed_offer_id: Feed offer ID
-        :param int task_id: Code of product import task on Ozon
-        :param str import_hash: Hash sum of imported parameters
+        Same as `update_or_create` for every offer, but with a fixed
+        number of queries.
 
-        :return result: Operation result
-        :rtype: Dict[str, Union[str, bool]]
-        """
-        domain = OzonAuthKey.objects.get(domain=self.domain)
-
-        offer, created = OzonOffer.objects.update_or_create(
-            domain=domain,
-            feed_offer_id=feed_offer_id,
-            defaults={
-                'task_id': task_id,
-                'last_import_hash': import_hash,
-            },
-        )
-
-        return offer
-
-    def set_ozon_product_id(
-        self,
-        feed_offer_id: str,
-        product_id: int,
-    ) -> OzonOffer:
-        """Set Ozon product ID.
+        :param offers_fields: Offer field values by feed offer ID
 
-        :param str feed_offer_id: Feed offer ID
-        :param int product_id: Ozon product ID
-
-        :return result: Operation result
-        :rtype: OzonOffer
+        :return result: Updated and created offers
+        :rtype: List[OzonOffer]
         """
-        domain = OzonAuthKey.objects.get(domain=self.domain)
-
-        offer, created = OzonOffer.objects.update_or_create(
-            domain=domain,
-            feed_offer_id=feed_offer_id,
-            defaults={
-                'product_id': product_id,
-            },
-        )
-
-        return offer
-
-
-    def set_ozon_offer_start_update(
-        self,
-        offer_id: str,
-        task_id: int,
-        import_hash: str,
-    ) -> OzonOffer:
-        """Set offer flags for start update."""
-        domain = OzonAuthKey.objects.get(domain=self.domain)
+        if not offers_fields:
+            return []
+
+        with transaction.atomic():
+            offers = {
+                offer.feed_offer_id: offer
+                for offer in OzonOffer.objects.select_for_update().filter(
+                    domain_id=self.domain,
+                    feed_offer_id__in=list(offers_fields),
+                )
+            }
 
-        offer, created = OzonOffer.objects.update_or_create(
-            domain=domain,
-            feed_offer_id=offer_id,
-            defaults={
-                'errors': '',
-                'is_imported': False,
-                'is_processed': False,
-                'task_id': task_id,
-                'last_import_hash': import_hash,
-            },
-        )
+            new_offers: List[OzonOffer] = []
+            update_fields: Set[str] = set()
+            for feed_offer_id, field_values in offers_fields.items():
+                offer = offers.get(feed_offer_id)
+                if offer is None:
+                    new_offers.append(OzonOffer(
+                        domain_id=self.domain,
+                        feed_offer_id=feed_offer_id,
+                        **field_values,
+                    ))
+                    continue
+
+                for field, value in field_values.items():
+                    setattr(offer, field, value)
+                update_fields.update(field_values)
+
+            if update_fields:
+                OzonOffer.objects.bulk_update(
+                    offers.values(),
+                    update_fields,
+                    batch_size=OZON_OFFERS_BATCH_SIZE,
+                )
+            OzonOffer.objects.bulk_create(
+                new_offers,
+                batch_size=OZON_OFFERS_BATCH_SIZE,
+            )
 
-        return offer
+        return [*offers.values(), *new_offers]
 
     def set_ozon_update_date(
         self,
@@ -537,7 +387,7 @@ class FetchOzonOfferData(MongoConnMixin):
         :return offer_id: Offer id in MySQL
         :rtype: OzonOffer
         """
-        domain = OzonAuthKey.objects.get(domain=self.domain)
+        domain = self.ozon_auth
 
         if errors is None:
             offer, _ = OzonOffer.objects.update_or_create(
@@ -568,9 +418,9 @@ class FetchOzonOfferData(MongoConnMixin):
         return offer
 
 
-    def get_ozon_auth(self):
+    def get_ozon_auth(self) -> OzonAuthKey:
         """Get domain object."""
-        return OzonAuthKey.objects.get(domain=self.domain)
+        return self.ozon_auth
 
     def get_feed_url(self):
         """Get feed url object."""
@@ -587,9 +437,7 @@ class FetchOzonOfferData(MongoConnMixin):
 
     def get_domain_settings(self) -> Dict[str, Any]:
         """Get domain settings."""
-        ozon_domain_settings = OzonAuthKey.objects.filter(
-            domain=self.domain,
-        ).first()
+        ozon_domain_settings = self.ozon_auth
 
         domain_settings: Dict[str, Any] = {}
 
@@ -636,6 +484,8 @@ class FetchOzonOfferData(MongoConnMixin):
 
     def get_last_import_hash(self, offer_id: str) -> str:
         """Get last import hash."""
-        domain = OzonAuthKey.objects.get(domain=self.domain)
-        offer = OzonOffer.objects.get(domain=domain, feed_offer_id=offer_id)
+        offer = OzonOffer.objects.get(
+            domain_id=self.domain,
+            feed_offer_id=offer_id,
+        )
         return offer.last_import_hash
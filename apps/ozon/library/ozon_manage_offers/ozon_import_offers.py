@@ -93,20 +93,22 @@ class OzonOfferImporter(ParamsConstructor):
                 item['task_id'] = product_import_info['task_id']
                 info.append(item)
 
+        offers_fields: Dict[str, Dict[str, Any]] = {}
+
         for item in info:
             for offer_id in item['offer_ids']:
-                self.fetcher.set_ozon_offer_start_import(
-                    feed_offer_id=offer_id,
+                offers_fields.setdefault(offer_id, {}).update(
                     task_id=item['task_id'],
-                    import_hash=import_params_hashes[offer_id],
+                    last_import_hash=import_params_hashes[offer_id],
                 )
 
         for item in error_infos:
             for offer_id in item['offer_ids']:
-                self.fetcher.set_ozon_error_description(
-                    offer_id,
-                    error_description={'import': item['error']},
-                )
+                offers_fields.setdefault(offer_id, {})['errors'] = {
+                    'import': item['error'],
+                }
+
+        self.fetcher.set_ozon_offers_fields(offers_fields)
 
         record_request_offers_data(
             domain=self.fetcher.domain,
@@ -44,33 +44,31 @@ class OzonImportStatusChecker(ParamsConstructor):
 
         processed: List[Dict[str, Any]] = []
         not_processed: List[Dict[str, Any]] = []
+        offers_fields: Dict[str, Dict[str, Any]] = {}
 
         for import_product_info in import_product_infos:
             feed_offer_id = import_product_info['offer_id']
             status = import_product_info['status']
 
+            offer_fields = offers_fields.setdefault(feed_offer_id, {})
+
             if status == IMPORTED:
-                self.fetcher.set_ozon_import_status(
-                    feed_offer_id=feed_offer_id,
+                offer_fields.update(
                     is_imported=True,
-                )
-
-                self.fetcher.set_ozon_product_id(
-                    feed_offer_id=feed_offer_id,
                     product_id=import_product_info['product_id'],
                 )
 
                 processed.append(import_product_info)
 
             else:
-                self.fetcher.set_ozon_import_status(
-                    feed_offer_id=feed_offer_id,
-                    is_imported=False,
-                    clear_hash=status == FAILED,
-                )
+                offer_fields['is_imported'] = False
+                if status == FAILED:
+                    offer_fields['last_import_hash'] = ''
 
                 not_processed.append(import_product_info)
 
+        self.fetcher.set_ozon_offers_fields(offers_fields)
+
         result = {
             'processed': processed,
             'not_processed': not_processed,
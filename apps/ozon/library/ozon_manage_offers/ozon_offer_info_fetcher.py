@@ -3,7 +3,7 @@ import itertools
 import logging
 from datetime import datetime, timedelta
 
-from typing import List
+from typing import Any, Dict, List
 
 from apps.ozon.utils.api_connector.seller.api_wrapper import (
     chain_all_products,
@@ -12,6 +12,7 @@ from apps.ozon.utils.api_connector.seller.api_wrapper import (
 from apps.utils.futures_utils import concurrent_io_start
 from apps.utils.iterable_utils import split_to_chunks
 
+from .fetch_ozon_offers_data import OZON_OFFERS_BATCH_SIZE
 from .params_manager import ParamsConstructor
 
 log = logging.getLogger('ozon_offer_state_fetcher')
@@ -27,67 +28,87 @@ class OzonOfferInfoFetcher(ParamsConstructor):
     """
 
     def fetch_imported_offers_info(self) -> List[object]:
-        """Fetch imported offers info from OZON."""
+        """Fetch imported offers info from OZON.
+
+        Fetched info is saved every `OZON_OFFERS_BATCH_SIZE` offers and
+        on failure, so API errors do not discard already fetched offers.
+        """
         imported_offers_info_storage: List[object] = []
+        offers_fields: Dict[str, Dict[str, Any]] = {}
 
         processed_offers = self.fetcher.processed_offers_ids
         unprocessed_offers = self.fetcher.unprocessed_offers_ids
 
-        for offer_id in unprocessed_offers:
-            imported_offers_info = (
-                get_product_info_list(
+        try:
+            for offer_id in unprocessed_offers:
+                imported_offers_info = (
+                    get_product_info_list(
+                        domain=self.fetcher.domain,
+                        offer_id=[offer_id],
+                        product_id=None,
+                        sku=None,
+                        trace_requests=True,
+                    )[0]
+                )
+
+                state = imported_offers_info['statuses']['moderate_status']
+
+                offers_fields[offer_id] = {
+                    'state': state,
+                    'is_processed': state == PROCESSED,
+                    'product_id': imported_offers_info['id'],
+                    'errors': imported_offers_info['errors'],
+                }
+                self.save_offers_fields(
+                    offers_fields,
+                    imported_offers_info_storage,
+                )
+
+            for offer_id in processed_offers:
+                processed_offer_info = get_product_info_list(
                     domain=self.fetcher.domain,
                     offer_id=[offer_id],
                     product_id=None,
                     sku=None,
                     trace_requests=True,
                 )[0]
-            )
 
-            if imported_offers_info['statuses']['moderate_status'] == PROCESSED:
-                imported_offers_info_storage.append(
-                    self.fetcher.set_ozon_offer_state(
-                        feed_offer_id=offer_id,
-                        state=imported_offers_info['statuses']['moderate_status'],
-                        is_processed=True,
-                    ),
+                offers_fields[offer_id] = {
+                    'product_id': processed_offer_info['id'],
+                }
+                self.save_offers_fields(
+                    offers_fields,
+                    imported_offers_info_storage,
                 )
-            else:
-                imported_offers_info_storage.append(
-                    self.fetcher.set_ozon_offer_state(
-                        feed_offer_id=offer_id,
-                        state=imported_offers_info['statuses']['moderate_status'],
-                    ),
-                )
-
-
-            self.fetcher.set_ozon_product_id(
-                offer_id,
-                imported_offers_info['id'],
-            )
-
-            imported_offers_info_storage.append(
-                self.fetcher.set_ozon_error_description(
-                    feed_offer_id=offer_id,
-                    error_description=imported_offers_info['errors'],
-                ),
-            )
-
-        for offer_id in processed_offers:
-            processed_offer_info = get_product_info_list(
-                domain=self.fetcher.domain,
-                offer_id=[offer_id],
-                product_id=None,
-                sku=None,
-                trace_requests=True,
-            )[0]
-            self.fetcher.set_ozon_product_id(
-                offer_id,
-                processed_offer_info['id'],
+        finally:
+            self.save_offers_fields(
+                offers_fields,
+                imported_offers_info_storage,
+                force=True,
             )
 
         return imported_offers_info_storage
 
+    def save_offers_fields(
+        self,
+        offers_fields: Dict[str, Dict[str, Any]],
+        saved_offers: List[object],
+        force: bool = False,
+    ):
+        """Save collected offers fields once batch is full.
+
+        :param offers_fields: Offer field values by feed offer ID,
+                              cleared after saving
+        :param saved_offers: Storage for saved offers
+        :param bool force: Save not full batch too
+        """
+        if not force and len(offers_fields) < OZON_OFFERS_BATCH_SIZE:
+            return
+
+        batch = dict(offers_fields)
+        offers_fields.clear()
+        saved_offers.extend(self.fetcher.set_ozon_offers_fields(batch))
+
     def batch_get_product_info_list(
         self,
         offer_ids: List[str],
@@ -110,20 +110,25 @@ class OzonOffersUpdater(OzonOfferImporter):
                 item['task_id'] = product_import_info['task_id']
                 updated_info.append(item)
 
+        offers_fields: Dict[str, Dict[str, Any]] = {}
+
         for item in updated_info:
             for offer_id in item['offer_ids']:
-                self.fetcher.set_ozon_offer_start_update(
-                    offer_id,
+                offers_fields.setdefault(offer_id, {}).update(
+                    errors='',
+                    is_imported=False,
+                    is_processed=False,
                     task_id=item['task_id'],
-                    import_hash=import_params_hashes[offer_id],
+                    last_import_hash=import_params_hashes[offer_id],
                 )
 
         for item in error_infos:
             for offer_id in item['offer_ids']:
-                self.fetcher.set_ozon_error_description(
-                    offer_id,
-                    error_description={'import-update': item['error']},
-                )
+                offers_fields.setdefault(offer_id, {})['errors'] = {
+                    'import-update': item['error'],
+                }
+
+        self.fetcher.set_ozon_offers_fields(offers_fields)
 
         record_request_offers_data(
             domain=self.fetcher.domain,
@@ -4,9 +4,15 @@ import time
 import logging
 
 from bs4 import BeautifulSoup
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 
-from apps.mapper.utils.utils import get_mapped_values, normalize_string
+from django.utils.functional import cached_property
+
+from apps.mapper.utils.utils import (
+    get_mapped_values,
+    get_unit_map,
+    normalize_string,
+)
 from apps.ozon.library.ozon_manage_offers.fetch_ozon_offers_data import (
     FetchOzonOfferData,
 )
@@ -107,6 +113,11 @@ class OzonOfferParamsManager:
         self._tags_errors = Dict[str, str]
         self.initial = None
 
+    @cached_property
+    def value_unit_map(self) -> Dict[Tuple[int, int], float]:
+        """Value unit mapping, loaded once per offers processing run."""
+        return get_unit_map()
+
     def _get_mapping_feed_id(
         self
     ) -> Optional[int]:
@@ -498,6 +509,7 @@ class OzonOfferParamsManager:
         marketplace_attributes_values = get_mapped_values(
             self._attribute_map,
             feed_params_values,
+            value_unit_map=self.value_unit_map,
         )
 
         for values_data in marketplace_attributes_values['values'].values():
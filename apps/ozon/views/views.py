@@ -21,6 +21,10 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 
+EMAIL_REGEX = re.compile(
+    r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b',
+)
+
 
 class AuthKeyViewSet(ModelViewSet):
     """Endpoint for auth keys."""
@@ -110,10 +114,7 @@ class OzonOffersErrorsReportView(APIView):
 
 def is_email_valid(email: str) -> bool:
     """Check if email str is valid."""
-    regex = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-    if (re.fullmatch(regex, email)):
-        return True
-    return False
+    return EMAIL_REGEX.fullmatch(email) is not None
 
 
 class DomainViewSet(ListAPIView):